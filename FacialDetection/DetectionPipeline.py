@@ -0,0 +1,337 @@
+"""
+Pipelined face detection: capture, inference & render run as separate stages so the frame
+rate is bound by the slowest stage instead of the sum of all of them.
+- capture thread keeps only the newest frame (stale frames are dropped, never queued)
+- inference worker runs the detector on whatever frame is newest when it is free
+- render stage (the caller's thread, cv2.imshow needs it) draws & shows the results
+Stages are joined by bounded queues & every stage keeps FPS & latency counters.
+
+Provides:
+- Detection Class
+- FrameResult Class
+- StageStats Class
+- VideoSource Class
+- YoloDetector Class
+- CenterBounds(width, pct) -> (int, int)
+- DrawDetections(frame, detections, pct) -> frame
+- DetectionPipeline Class
+"""
+
+import time
+import queue
+import threading
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Dict, Any
+
+import cv2
+
+DEFAULT_WEIGHTS = "yolov11s-face.pt"
+DEFAULT_CONF = 0.4
+DEFAULT_PCT = 50  # How much of the screen width counts as centered
+
+
+class Detection:
+    """One face box in frame pixel coordinates"""
+    __slots__ = ("x1", "y1", "x2", "y2", "conf")
+
+    def __init__(self, x1: float, y1: float, x2: float, y2: float, conf: Optional[float] = None):
+        self.x1, self.y1, self.x2, self.y2 = int(x1), int(y1), int(x2), int(y2)
+        self.conf = None if conf is None else float(conf)
+
+    @property
+    def cx(self) -> int:
+        return (self.x1 + self.x2) // 2
+
+    @property
+    def cy(self) -> int:
+        return (self.y1 + self.y2) // 2
+
+
+class FrameResult:
+    """A frame travelling through the pipeline"""
+    __slots__ = ("frame_id", "captured", "frame", "detections", "inferred")
+
+    def __init__(self, frame_id: int, captured: float, frame, detections: Optional[List[Detection]] = None):
+        self.frame_id = frame_id
+        self.captured = captured
+        self.frame = frame
+        self.detections = detections or []
+        self.inferred = False
+
+
+class StageStats:
+    """Thread-safe frame count, FPS over a sliding window & latency for one stage"""
+
+    def __init__(self, name: str, window: float = 2.0):
+        self.name = name
+        self.window = window
+        self.lock = threading.Lock()
+        self.stamps = deque()
+        self.frames = 0
+        self.dropped = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+        self.started = time.perf_counter()
+
+    def record(self, latency: float):
+        now = time.perf_counter()
+        with self.lock:
+            self.frames += 1
+            self.total_latency += latency
+            self.last_latency = latency
+            self.stamps.append(now)
+            while self.stamps and now - self.stamps[0] > self.window:
+                self.stamps.popleft()
+
+    def drop(self):
+        with self.lock:
+            self.dropped += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            span = self.stamps[-1] - self.stamps[0] if len(self.stamps) > 1 else 0.0
+            elapsed = time.perf_counter() - self.started
+            return {
+                "frames": self.frames,
+                "dropped": self.dropped,
+                "fps": (len(self.stamps) - 1) / span if span else 0.0,
+                "avg_fps": self.frames / elapsed if elapsed else 0.0,
+                "avg_ms": self.total_latency / self.frames * 1000 if self.frames else 0.0,
+                "last_ms": self.last_latency * 1000
+            }
+
+
+class VideoSource:
+    """
+    Camera index or video file. Files can be replayed on a wall clock (realtime=True) so they
+    behave like a camera: frames keep coming at the recorded rate & a reader that falls behind
+    skips the frames it missed. timestamp is when the last returned frame was captured.
+    """
+
+    def __init__(self, source=0, realtime: bool = True):
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source {source}")
+        self.is_file = isinstance(source, str)
+        if not self.is_file:
+            #Keep the driver from buffering frames we will never show
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 0
+        self.interval = 1.0 / fps if (self.is_file and realtime and fps > 0) else 0.0
+        self.started = None
+        self.index = 0
+        self.skipped = 0
+        self.timestamp = 0.0
+
+    def read(self):
+        """Next frame or None at the end of the stream"""
+        if self.interval:
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = now
+            #Frames whose time has passed were overwritten in a camera, skip them
+            due = int((now - self.started) / self.interval)
+            while self.index < due:
+                if not self.cap.grab():
+                    return None
+                self.index += 1
+                self.skipped += 1
+            wait = self.started + self.index * self.interval - now
+            if wait > 0:
+                time.sleep(wait)
+            self.timestamp = self.started + self.index * self.interval
+            self.index += 1
+        ret, frame = self.cap.read()
+        if not self.interval:
+            self.timestamp = time.perf_counter()
+        return frame if ret else None
+
+    def release(self):
+        self.cap.release()
+
+
+class YoloDetector:
+    """Callable frame -> List[Detection] around an Ultralytics YOLO face model"""
+
+    def __init__(self, weights: str = DEFAULT_WEIGHTS, conf: float = DEFAULT_CONF, imgsz: Optional[int] = None):
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.conf = conf
+        #Smaller inference size for downscaled input, otherwise YOLO letterboxes it back up
+        self.kwargs = {"imgsz": imgsz} if imgsz else {}
+
+    def __call__(self, frame) -> List[Detection]:
+        res = self.model(frame, conf=self.conf, verbose=False, **self.kwargs)[0]
+        boxes = getattr(res, "boxes", None)
+        if boxes is None or not len(boxes):
+            return []
+        confs = boxes.conf.tolist() if boxes.conf is not None else [None] * len(boxes)
+        return [Detection(*box, conf) for box, conf in zip(boxes.xyxy.tolist(), confs)]
+
+
+def CenterBounds(width: int, pct: int = DEFAULT_PCT):
+    """Left & right x of the center column, height is ignored on purpose"""
+    return int(width * ((100 - pct) / 2) / 100), int(width * ((100 + pct) / 2) / 100)
+
+
+def DrawDetections(frame, detections: List[Detection], pct: int = DEFAULT_PCT):
+    """Same overlay as the original demo: center column, boxes & centered/off-center labels"""
+    h, w = frame.shape[:2]
+    leftBound, rightBound = CenterBounds(w, pct)
+    out = frame.copy()
+
+    cv2.rectangle(out, (leftBound, 0), (rightBound, h), (255, 0, 0), 2)
+    cv2.putText(out, f"center column ({pct}%)", (leftBound + 6, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+
+    if not detections:
+        cv2.putText(out, "!!No face detected!!", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 255), 2)
+        return out
+
+    for det in detections:
+        inside = leftBound <= det.cx <= rightBound
+        color = (0, 255, 0) if inside else (0, 0, 255)
+
+        cv2.rectangle(out, (det.x1, det.y1), (det.x2, det.y2), color, 2)
+        cv2.circle(out, (det.cx, det.cy), 3, color, -1)
+
+        label = f"face{f' {det.conf:.2f}' if det.conf is not None else ''}"
+        cv2.putText(out, label, (det.x1, det.y1 - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        cv2.putText(out, "centered" if inside else "off-center", (det.x1, det.y2 + 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    return out
+
+
+def _PutLatest(q: "queue.Queue", item, stats: Optional[StageStats] = None):
+    """Put item, replacing whatever the consumer hasn't picked up yet"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+                if stats is not None:
+                    stats.drop()
+            except queue.Empty:
+                pass
+
+
+class DetectionPipeline:
+    """
+    Runs capture & inference on background threads, results() yields inferred frames.
+    drop_stale=False makes every stage block instead of dropping, which processes every
+    frame of a file (throughput benchmark) instead of always showing the newest one.
+    """
+
+    def __init__(self, source: VideoSource, detector: Callable, drop_stale: bool = True, queue_size: int = 1):
+        self.source = source
+        self.detector = detector
+        self.drop_stale = drop_stale
+        self.frames: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.results_queue: "queue.Queue" = queue.Queue(maxsize=queue_size + 1)
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self.stats = {name: StageStats(name) for name in ("capture", "inference", "render", "end_to_end")}
+
+    def _put(self, q: "queue.Queue", item, stats: StageStats):
+        if self.drop_stale and item is not None:
+            _PutLatest(q, item, stats)
+            return
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _capture(self):
+        frame_id = 0
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                frame = self.source.read()
+                if frame is None:
+                    break
+                self.stats["capture"].record(time.perf_counter() - start)
+                self._put(self.frames, FrameResult(frame_id, self.source.timestamp, frame), self.stats["capture"])
+                frame_id += 1
+        finally:
+            self._put(self.frames, None, self.stats["capture"])
+
+    def _infer(self):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    item = self.frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                start = time.perf_counter()
+                item.detections = self.process(item)
+                self.stats["inference"].record(time.perf_counter() - start)
+                self._put(self.results_queue, item, self.stats["inference"])
+        finally:
+            self._put(self.results_queue, None, self.stats["inference"])
+
+    def process(self, item: FrameResult) -> List[Detection]:
+        """Detections for one frame, subclasses can skip or shrink the detector call"""
+        item.inferred = True
+        return self.detector(item.frame)
+
+    def start(self) -> "DetectionPipeline":
+        self.stop_event.clear()
+        self.threads = [
+            threading.Thread(target=self._capture, name="capture", daemon=True),
+            threading.Thread(target=self._infer, name="inference", daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def results(self) -> Iterator[FrameResult]:
+        """Inferred frames in order until the source ends or stop() is called"""
+        while not self.stop_event.is_set():
+            try:
+                item = self.results_queue.get(timeout=0.1)
+            except queue.Empty:
+                if not any(thread.is_alive() for thread in self.threads):
+                    break
+                continue
+            if item is None:
+                break
+            yield item
+
+    def run(self, display: bool = True, pct: int = DEFAULT_PCT, window: str = "Facial detection",
+            on_result: Optional[Callable[[FrameResult], Any]] = None, max_frames: Optional[int] = None):
+        """Render stage: draw & show each result (or only count it when headless)"""
+        self.start()
+        try:
+            for count, item in enumerate(self.results(), 1):
+                start = time.perf_counter()
+                if on_result is not None:
+                    on_result(item)
+                if display:
+                    cv2.imshow(window, DrawDetections(item.frame, item.detections, pct))
+                    if (cv2.waitKey(1) & 0xFF == ord("q")) or cv2.getWindowProperty(window, cv2.WND_PROP_VISIBLE) < 1:
+                        break
+                done = time.perf_counter()
+                self.stats["render"].record(done - start)
+                self.stats["end_to_end"].record(done - item.captured)
+                if max_frames is not None and count >= max_frames:
+                    break
+        finally:
+            self.stop()
+            if display:
+                cv2.destroyAllWindows()
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.source.release()
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """FPS & latency per stage, end_to_end is capture to rendered"""
+        report = {name: stats.snapshot() for name, stats in self.stats.items()}
+        report["capture"]["dropped"] += getattr(self.source, "skipped", 0)
+        return report
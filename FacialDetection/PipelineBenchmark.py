@@ -0,0 +1,105 @@
+"""
+Headless benchmark of the detection pipeline on a recorded video, no camera or display needed.
+run using python FacialDetection/PipelineBenchmark.py <video>
+
+Compares the original serial loop (read, detect, draw one after another) with DetectionPipeline.
+By default every frame is processed to compare throughput, --realtime replays the file at
+its recorded frame rate like a live camera, where the pipeline drops stale frames instead.
+--track N adds a TrackingPipeline run that only detects every N frames.
+"""
+
+import argparse
+import time
+
+from DetectionPipeline import (DetectionPipeline, VideoSource, YoloDetector, DrawDetections, StageStats,
+                               DEFAULT_WEIGHTS, DEFAULT_CONF, DEFAULT_PCT)
+from TrackingPipeline import TrackingPipeline, ROI_PCT, ROI_SCALE
+
+
+def RunSerial(path: str, detector, realtime: bool, max_frames=None):
+    """The DetectionDemo loop without imshow, timed per stage"""
+    source = VideoSource(path, realtime=realtime)
+    stats = {name: StageStats(name) for name in ("capture", "inference", "render", "end_to_end")}
+    count = 0
+    while max_frames is None or count < max_frames:
+        start = time.perf_counter()
+        frame = source.read()
+        if frame is None:
+            break
+        captured = source.timestamp
+        stats["capture"].record(time.perf_counter() - start)
+
+        began = time.perf_counter()
+        detections = detector(frame)
+        inferred = time.perf_counter()
+        stats["inference"].record(inferred - began)
+
+        DrawDetections(frame, detections, DEFAULT_PCT)
+        done = time.perf_counter()
+        stats["render"].record(done - inferred)
+        stats["end_to_end"].record(done - captured)
+        count += 1
+    source.release()
+    report = {name: s.snapshot() for name, s in stats.items()}
+    report["capture"]["dropped"] += source.skipped
+    return report
+
+
+def RunPipelined(path: str, detector, realtime: bool, max_frames=None):
+    pipeline = DetectionPipeline(VideoSource(path, realtime=realtime), detector, drop_stale=realtime)
+    pipeline.run(display=False, on_result=lambda item: DrawDetections(item.frame, item.detections, DEFAULT_PCT),
+                 max_frames=max_frames)
+    return pipeline.report()
+
+
+def RunTracking(path: str, detector, realtime: bool, detect_every: int, roi_pct: int, scale: float, max_frames=None):
+    """TrackingPipeline run, also returns the share of frames that ran the detector & the events seen"""
+    events = []
+    pipeline = TrackingPipeline(VideoSource(path, realtime=realtime), detector, detect_every=detect_every,
+                                roi_pct=roi_pct, scale=scale, on_event=events.append, drop_stale=realtime)
+    pipeline.run(display=False, on_result=lambda item: DrawDetections(item.frame, item.detections, DEFAULT_PCT),
+                 max_frames=max_frames)
+    return pipeline.report(), pipeline.detection_ratio(), events
+
+
+def PrintStages(title: str, report):
+    print("\n" + "="*60)
+    print(title)
+    print("="*60)
+    for name, row in report.items():
+        print(f"{name:>11}  frames: {row['frames']:>5} | dropped: {row['dropped']:>4} | "
+              f"avg fps: {row['avg_fps']:6.1f} | avg: {row['avg_ms']:7.1f} ms")
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Facial detection pipeline benchmark")
+    parser.add_argument("video", help="Recorded video file to replay")
+    parser.add_argument("-w", "--weights", default=DEFAULT_WEIGHTS, help="YOLO face weights")
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONF, help="Detection confidence threshold")
+    parser.add_argument("--realtime", action="store_true", help="Replay at the recorded frame rate like a camera")
+    parser.add_argument("-n", "--frames", type=int, help="Stop after this many rendered frames")
+    parser.add_argument("--track", type=int, metavar="N", help="Also run tracking mode, detecting every N frames")
+    parser.add_argument("--roi-pct", type=int, default=ROI_PCT, help="Center crop width for detection in tracking mode")
+    parser.add_argument("--scale", type=float, default=ROI_SCALE, help="Detection downscale in tracking mode")
+    parser.add_argument("--imgsz", type=int, help="YOLO inference size")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    detector = YoloDetector(args.weights, args.conf, args.imgsz)
+    #Warm the model once so neither run pays for loading it
+    warm = VideoSource(args.video, realtime=False)
+    first = warm.read()
+    warm.release()
+    if first is not None:
+        detector(first)
+
+    PrintStages("Serial loop", RunSerial(args.video, detector, args.realtime, args.frames))
+    PrintStages("Pipelined", RunPipelined(args.video, detector, args.realtime, args.frames))
+    if args.track:
+        report, ratio, events = RunTracking(args.video, detector, args.realtime, args.track,
+                                            args.roi_pct, args.scale, args.frames)
+        PrintStages(f"Tracking (detect every {args.track})", report)
+        print(f"\nDetector ran on {ratio:.0%} of frames, {len(events)} centered/off-center/lost events")
@@ -0,0 +1,238 @@
+"""
+Detection plus tracking: full YOLO inference only runs every N frames or when a track's
+confidence drops, & on its own cadence while nothing is tracked. Frames in between move the
+last boxes with pyramidal Lucas-Kanade optical flow, which costs a fraction of a detector call and
+leaves the accelerator free for the LLM. Detection itself runs on a center-cropped and/or
+downscaled region of interest. Changes in centered/off-center state are reported as events
+to a callback instead of only being drawn on screen.
+
+Provides:
+- FaceEvent Class
+- FaceTracker Class
+- RoiDetector Class
+- TrackingPipeline Class
+"""
+
+import time
+from typing import Callable, List, Optional, Any
+
+import cv2
+import numpy as np
+
+from DetectionPipeline import (Detection, DetectionPipeline, FrameResult, StageStats, VideoSource,
+                               CenterBounds, DEFAULT_PCT)
+
+DETECT_EVERY = 10      # Frames between full detections while tracks are healthy
+IDLE_EVERY = 10        # Frames between full detections while no face is tracked
+MIN_TRACK_CONF = 0.5   # Re-detect as soon as any track falls below this
+ROI_PCT = 100          # Width of the center crop handed to the detector, 100 = whole frame
+ROI_SCALE = 0.5        # Downscale applied to the crop before detection
+MATCH_IOU = 0.3        # Overlap needed for a detection to keep an existing track id
+
+
+def _IoU(a: Detection, b: Detection) -> float:
+    ix = max(0, min(a.x2, b.x2) - max(a.x1, b.x1))
+    iy = max(0, min(a.y2, b.y2) - max(a.y1, b.y1))
+    inter = ix * iy
+    union = (a.x2 - a.x1) * (a.y2 - a.y1) + (b.x2 - b.x1) * (b.y2 - b.y1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceEvent:
+    """A track entering a state: "centered", "off-center" or "lost" """
+    __slots__ = ("track_id", "state", "frame_id", "timestamp", "detection")
+
+    def __init__(self, track_id: int, state: str, frame_id: int, timestamp: float, detection: Optional[Detection]):
+        self.track_id = track_id
+        self.state = state
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.detection = detection
+
+    def __repr__(self):
+        return f"FaceEvent(track={self.track_id}, state={self.state}, frame={self.frame_id})"
+
+
+class _Track:
+    __slots__ = ("track_id", "box", "points", "initial", "confidence", "centered")
+
+    def __init__(self, track_id: int, box: Detection):
+        self.track_id = track_id
+        self.box = box
+        self.points = None
+        self.initial = 0
+        self.confidence = 0.0
+        self.centered = None
+
+
+class FaceTracker:
+    """
+    Optical flow tracker for a handful of face boxes.
+    Each track follows corner features inside its box. Confidence is the share of those
+    features that survive a forward-backward flow check, so occlusion or fast motion lowers
+    it & triggers a fresh detection.
+    """
+
+    def __init__(self, max_points: int = 30, fb_error: float = 1.0):
+        self.max_points = max_points
+        self.fb_error = fb_error
+        self.tracks: List[_Track] = []
+        self.prev_gray = None
+        self.next_id = 0
+
+    def _seed(self, gray, track: _Track):
+        """Pick corner features inside the inner part of the box"""
+        h, w = gray.shape[:2]
+        box = track.box
+        mx, my = (box.x2 - box.x1) // 10, (box.y2 - box.y1) // 10
+        x1, y1 = max(0, box.x1 + mx), max(0, box.y1 + my)
+        x2, y2 = min(w, box.x2 - mx), min(h, box.y2 - my)
+        track.points, track.initial = None, 0
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            track.confidence = 0.0
+            return
+        corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], maxCorners=self.max_points, qualityLevel=0.01, minDistance=3)
+        if corners is None:
+            track.confidence = 0.0
+            return
+        track.points = (corners.reshape(-1, 2) + (x1, y1)).astype(np.float32)
+        track.initial = len(track.points)
+        track.confidence = 1.0
+
+    def reset(self, gray, detections: List[Detection]):
+        """Replace the tracks with fresh detections, keeping ids of boxes that overlap old ones"""
+        tracks, unmatched = [], list(self.tracks)
+        for det in sorted(detections, key=lambda d: d.conf or 0.0, reverse=True):
+            best = max(unmatched, key=lambda t: _IoU(t.box, det), default=None)
+            if best is not None and _IoU(best.box, det) >= MATCH_IOU:
+                unmatched.remove(best)
+                best.box = det
+                track = best
+            else:
+                track = _Track(self.next_id, det)
+                self.next_id += 1
+            self._seed(gray, track)
+            tracks.append(track)
+        self.tracks = tracks
+        self.prev_gray = gray
+        return unmatched
+
+    def update(self, gray):
+        """
+        Move every track to the new frame. A track that loses its features keeps its last box
+        with confidence 0 until the next detection either re-finds it or reports it lost.
+        """
+        h, w = gray.shape[:2]
+        for track in self.tracks:
+            if track.points is None or not len(track.points):
+                track.confidence = 0.0
+                continue
+            pts = track.points.reshape(-1, 1, 2)
+            new, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, pts, None, winSize=(15, 15), maxLevel=2)
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, new, None, winSize=(15, 15), maxLevel=2)
+            error = np.linalg.norm((pts - back).reshape(-1, 2), axis=1)
+            good = (status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (error < self.fb_error)
+            if good.sum() < 3:
+                track.points, track.confidence = None, 0.0
+                continue
+
+            old_pts, new_pts = pts.reshape(-1, 2)[good], new.reshape(-1, 2)[good]
+            dx, dy = np.median(new_pts - old_pts, axis=0)
+            box = track.box
+            bw, bh = box.x2 - box.x1, box.y2 - box.y1
+            x1 = min(max(0, box.x1 + dx), w - bw)
+            y1 = min(max(0, box.y1 + dy), h - bh)
+            track.box = Detection(x1, y1, x1 + bw, y1 + bh, box.conf)
+            track.points = new_pts
+            track.confidence = len(new_pts) / track.initial
+        self.prev_gray = gray
+
+    def min_confidence(self) -> float:
+        return min((track.confidence for track in self.tracks), default=0.0)
+
+    def detections(self) -> List[Detection]:
+        return [track.box for track in self.tracks]
+
+
+class RoiDetector:
+    """Runs a detector on a center crop of roi_pct width, downscaled by scale, & maps boxes back"""
+
+    def __init__(self, detector: Callable, roi_pct: int = ROI_PCT, scale: float = ROI_SCALE):
+        self.detector = detector
+        self.roi_pct = roi_pct
+        self.scale = scale
+
+    def __call__(self, frame) -> List[Detection]:
+        h, w = frame.shape[:2]
+        x0, x1 = CenterBounds(w, self.roi_pct) if self.roi_pct < 100 else (0, w)
+        crop = frame[:, x0:x1]
+        if self.scale != 1.0:
+            crop = cv2.resize(crop, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return [Detection(d.x1 / self.scale + x0, d.y1 / self.scale, d.x2 / self.scale + x0, d.y2 / self.scale, d.conf)
+                for d in self.detector(crop)]
+
+
+class TrackingPipeline(DetectionPipeline):
+    """
+    DetectionPipeline whose inference stage only calls the detector when needed.
+    on_event is called from the inference thread with a FaceEvent whenever a track appears,
+    crosses the center column or is lost, keep it short or hand the event to a queue.
+    """
+
+    def __init__(self, source: VideoSource, detector: Callable, detect_every: int = DETECT_EVERY,
+                 min_confidence: float = MIN_TRACK_CONF, roi_pct: int = ROI_PCT, scale: float = ROI_SCALE,
+                 pct: int = DEFAULT_PCT, on_event: Optional[Callable[[FaceEvent], Any]] = None,
+                 idle_every: int = IDLE_EVERY, **kwargs):
+        super().__init__(source, RoiDetector(detector, roi_pct, scale), **kwargs)
+        self.detect_every = max(1, detect_every)
+        self.idle_every = max(1, idle_every)
+        self.min_confidence = min_confidence
+        self.pct = pct
+        self.on_event = on_event
+        self.tracker = FaceTracker()
+        self.since_detect = None
+        self.stats["detect"] = StageStats("detect")
+        self.stats["track"] = StageStats("track")
+
+    def _due(self) -> bool:
+        if self.since_detect is None:
+            return True
+        #An empty frame has nothing to track, re-detecting it every frame would just keep YOLO busy
+        if not self.tracker.tracks:
+            return self.since_detect >= self.idle_every
+        return self.since_detect >= self.detect_every or self.tracker.min_confidence() < self.min_confidence
+
+    def process(self, item: FrameResult) -> List[Detection]:
+        start = time.perf_counter()
+        gray = cv2.cvtColor(item.frame, cv2.COLOR_BGR2GRAY)
+        if self._due():
+            lost = self.tracker.reset(gray, self.detector(item.frame))
+            self.since_detect = 0
+            item.inferred = True
+            self.stats["detect"].record(time.perf_counter() - start)
+        else:
+            self.tracker.update(gray)
+            lost = []
+            self.since_detect += 1
+            self.stats["track"].record(time.perf_counter() - start)
+        self._emit(item, lost)
+        return self.tracker.detections()
+
+    def _emit(self, item: FrameResult, lost: List[_Track]):
+        """Compare each track's centered state with the last frame & report changes"""
+        leftBound, rightBound = CenterBounds(item.frame.shape[1], self.pct)
+        events = [FaceEvent(track.track_id, "lost", item.frame_id, item.captured, track.box) for track in lost]
+        for track in self.tracker.tracks:
+            centered = leftBound <= track.box.cx <= rightBound
+            if centered != track.centered:
+                track.centered = centered
+                events.append(FaceEvent(track.track_id, "centered" if centered else "off-center",
+                                        item.frame_id, item.captured, track.box))
+        if self.on_event is not None:
+            for event in events:
+                self.on_event(event)
+
+    def detection_ratio(self) -> float:
+        """Share of processed frames that ran the detector"""
+        detected, tracked = self.stats["detect"].frames, self.stats["track"].frames
+        return detected / (detected + tracked) if detected + tracked else 0.0
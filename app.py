@@ -8,17 +8,47 @@ https://github.com/amscotti/local-LLM-with-RAG
 
 import argparse
 import sys
-from langchain_ollama import ChatOllama
+from contextlib import nullcontext
 
 # Pull funcs from local files
-from model import CheckModelAvailability
+from model import ProvisionModels, ModelName
 from database_bridge import InitializeDatabase
-from llm import BuildChain
+from llm import BuildChain, CreateLLM
 from lightrag import LightRAG
-from config import DEFAULT_EMBEDDING_MODEL, DEFAULT_MODEL, DEFAULT_DOCS_PATH
+from router import ModelRouter
+from prefetch import PrefetchingStore
+from batch import LoadQuestions, RunBatch
+from memory_governor import StartGovernor
+from profiling import QueryProfiler
+from warmup import StartupWarmUp, FirstQueryTracker
+from config import DEFAULT_EMBEDDING_MODEL, DEFAULT_MODEL, DEFAULT_DOCS_PATH, VECTOR_BACKEND, BATCH_CONCURRENCY
+from config import PROFILE_QUERIES, WARMUP_ENABLED, WARMUP_GENERATE, ROUTER_ENABLED, ROUTER_LARGE_MODEL
 
 
-def main(model_name: str, embedding_model: str, docs_path: str, reload: bool = False):
+def run_batch(llm, db, batch_path: str, output_path: str, mode: str, concurrency: int):
+    """Answer a whole file of questions instead of the interactive loop"""
+    questions = LoadQuestions(batch_path)
+    if not questions:
+        print(f"Error: No questions found in {batch_path}")
+        sys.exit(1)
+    
+    print(f"\nAnswering {len(questions)} questions ({mode} mode, concurrency {concurrency})...")
+    report = RunBatch(llm, db, questions, output_path, mode, concurrency)
+    
+    print("\n" + "="*60)
+    print("BATCH COMPLETE")
+    print("="*60)
+    print(f"Questions: {report['questions']} ({report['errors']} errors)")
+    print(f"Retrieval: {report['retrieval_s']:.1f}s | Total: {report['total_s']:.1f}s")
+    print(f"Throughput: {report['questions_per_minute']:.1f} questions/minute")
+    print(f"Answers written to {report['output']}")
+
+
+def main(model_name: str, embedding_model: str, docs_path: str, reload: bool = False, backend: str = VECTOR_BACKEND,
+         batch_path: str = None, output_path: str = "answers.jsonl", batch_mode: str = "normal",
+         concurrency: int = BATCH_CONCURRENCY, profile: int = 0, profiler_mode: str = "sample",
+         warmup: bool = WARMUP_ENABLED, warmup_generate: int = WARMUP_GENERATE, router: bool = ROUTER_ENABLED,
+         large_model: str = ROUTER_LARGE_MODEL):
     """Main application loop"""
     
     print("ECEN 214 Lab Assistant")
@@ -26,31 +56,66 @@ def main(model_name: str, embedding_model: str, docs_path: str, reload: bool = F
     
     # Check models
     print("\nChecking models...")
-    if not CheckModelAvailability(model_name):
+    # Every model is checked & pulled concurrently, a fresh box waits for the largest download only
+    models = ProvisionModels([model_name, embedding_model] + ([large_model] if router else []))
+    # Results are keyed by name, a pinned "name@sha256:..." is only needed for the pull
+    model_name, embedding_model, large_model = ModelName(model_name), ModelName(embedding_model), ModelName(large_model)
+    if not models[model_name]["ok"]:
         print(f"Error: Model {model_name} not available")
         sys.exit(1)
     
-    if not CheckModelAvailability(embedding_model):
+    if not models[embedding_model]["ok"]:
         print(f"Error: Embedding model {embedding_model} not available")
         sys.exit(1)
     
+    if router and not models[large_model]["ok"]:
+        print(f"Warning: Large model {large_model} not available, routing disabled")
+        router = False
+    
     # Initialize database
     print("\nInitializing document database...")
     try:
-        db = InitializeDatabase(embedding_model, docs_path, reload)
+        db = InitializeDatabase(embedding_model, docs_path, reload, backend)
+        # Lets the voice module send partial transcripts ahead of the full question
+        db = PrefetchingStore(db)
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
     
+    # Background memory cleanup, only acts when thresholds are crossed
+    # Under memory pressure only models other than these are unloaded, e.g. an idle router large model
+    StartGovernor(keep=[model_name, embedding_model])
+    
     # Initialize LLM and chains
     print("\nInitializing language model...")
-    llm = ChatOllama(model=model_name)
+    llm = CreateLLM(model_name)
+    if router:
+        # Easy questions stay on model_name, calculations & weakly grounded ones go to large_model
+        llm = ModelRouter(llm, CreateLLM(large_model))
+        print(f"Routing between {model_name} and {large_model}")
+    
+    # Opt-in profiling of the first N queries per mode
+    profiler = QueryProfiler(profiler_mode, queries=profile) if profile else None
+    
+    def profiled(label):
+        return profiler.profile(label) if profiler else nullcontext()
+    
+    if batch_path:
+        with profiled("batch"):
+            run_batch(llm, db, batch_path, output_path, batch_mode, concurrency)
+        return
+    
     chat = BuildChain(llm, db, session_id="main")
     lightrag = LightRAG(llm, db)
     
+    # Replay frequent questions so the first real queries hit warm caches
+    warmed = StartupWarmUp(db, llm, generate=warmup_generate) if warmup else None
+    tracker = FirstQueryTracker(warmed=warmed is not None)
+    
     print("\n" + "="*60)
     print("Ready. Ask questions or type 'quit' to exit.")
     print("Prefix with 'rag:' for enhanced retrieval mode.")
+    print("Lines prefixed with 'partial:' are partial transcripts used to prefetch documents.")
     print("="*60 + "\n")
     
     # Main loop
@@ -62,9 +127,21 @@ def main(model_name: str, embedding_model: str, docs_path: str, reload: bool = F
                 continue
             
             if user_input.lower() in ["quit", "exit", "q"]:
+                if profiler:
+                    for _, report in profiler.reports():
+                        print(report)
+                if router:
+                    print("\nModel routes (both modes, escalation is rag mode only):")
+                    for route, row in llm.stats().items():
+                        print(f"{route}: {row['queries']} queries, {row['avg_latency_s']:.2f}s avg")
                 print("\nGoodbye!")
                 break
             
+            if user_input.lower().startswith("partial:"):
+                # Voice-to-text partial, search ahead while the user is still talking
+                db.prefetch(user_input[8:].strip())
+                continue
+            
             if user_input.lower().startswith("rag:"):
                 # LightRAG mode
                 query = user_input[4:].strip()
@@ -72,12 +149,15 @@ def main(model_name: str, embedding_model: str, docs_path: str, reload: bool = F
                     print("Error: No question provided after 'rag:'")
                     continue
                 
-                result = lightrag.generate(query)
+                with profiled("rag"), tracker.measure():
+                    result = lightrag.generate(query)
                 
                 print("\n" + "="*60)
                 print("ANSWER")
                 print("="*60)
                 print(result["answer"])
+                if result.get("route"):
+                    print(f"(answered by the {result['route']} model)")
                 
                 print("\n" + "="*60)
                 print("EVIDENCE")
@@ -93,7 +173,8 @@ def main(model_name: str, embedding_model: str, docs_path: str, reload: bool = F
                     print(f"{i}. {source}")
             else:
                 # Normal mode
-                chat(user_input)
+                with profiled("normal"), tracker.measure():
+                    chat(user_input)
         
         except KeyboardInterrupt:
             print("\n\nInterrupted. Type 'quit' to exit.")
@@ -133,9 +214,90 @@ def parse_args():
         help="Force rebuild of vector database"
     )
     
+    parser.add_argument(
+        "-b", "--backend",
+        choices=["chroma", "mmap"],
+        default=VECTOR_BACKEND,
+        help=f"Vector store backend, mmap is the quantized edge index (default: {VECTOR_BACKEND})"
+    )
+    
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Answer every question in a CSV/JSONL/text file ('-' for stdin) instead of running interactively"
+    )
+    
+    parser.add_argument(
+        "-o", "--output",
+        default="answers.jsonl",
+        help="Batch mode output file, JSONL in input order (default: answers.jsonl)"
+    )
+    
+    parser.add_argument(
+        "--mode",
+        choices=["normal", "rag"],
+        default="normal",
+        help="Batch mode retrieval: normal RAG or LightRAG (default: normal)"
+    )
+    
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=BATCH_CONCURRENCY,
+        help=f"Batch mode generations in flight, set OLLAMA_NUM_PARALLEL to match (default: {BATCH_CONCURRENCY})"
+    )
+    
+    parser.add_argument(
+        "--profile",
+        type=int,
+        nargs="?",
+        const=PROFILE_QUERIES,
+        default=0,
+        metavar="N",
+        help=f"Profile the first N queries of each mode, written to storage/profiles (default N: {PROFILE_QUERIES})"
+    )
+    
+    parser.add_argument(
+        "--profiler",
+        choices=["sample", "cprofile"],
+        default="sample",
+        help="Stack sampling (collapsed stacks for flamegraphs) or cProfile (pstats) (default: sample)"
+    )
+    
+    parser.add_argument(
+        "--no-warmup",
+        dest="warmup",
+        action="store_false",
+        default=WARMUP_ENABLED,
+        help="Skip replaying frequent questions at startup"
+    )
+    
+    parser.add_argument(
+        "--warmup-generate",
+        type=int,
+        default=WARMUP_GENERATE,
+        metavar="N",
+        help=f"Also answer the first N warm-up questions to load the chat model (default: {WARMUP_GENERATE})"
+    )
+    
+    parser.add_argument(
+        "--router",
+        action="store_true",
+        default=ROUTER_ENABLED,
+        help="Route easy questions to --model and hard ones to --large-model"
+    )
+    
+    parser.add_argument(
+        "--large-model",
+        default=ROUTER_LARGE_MODEL,
+        help=f"Model used for hard questions when routing (default: {ROUTER_LARGE_MODEL})"
+    )
+    
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    main(args.model, args.embedding, args.path, args.reload)
\ No newline at end of file
+    main(args.model, args.embedding, args.path, args.reload, args.backend,
+         args.batch, args.output, args.mode, args.concurrency, args.profile, args.profiler,
+         args.warmup, args.warmup_generate, args.router, args.large_model)
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Batch question answering for whole problem sets & the eval CSV.
+All questions are embedded in one call & searched together, then answers are generated
+with bounded concurrency against Ollama & written to the output file in input order.
+
+Provides:
+- LoadQuestions(path) -> List[str]
+- RunBatch(llm, db, questions, output_path, mode, concurrency) -> dict
+"""
+
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any
+
+from database_bridge import CombineDocuments
+from lightrag import LightRAG
+from llm import BuildPrompt
+from router import SelectModel
+from vector_store import BatchSimilaritySearch
+from retrieval import AdaptiveCutoff
+from config import RETRIEVER_K, LIGHTRAG_K, BATCH_CONCURRENCY, ADAPTIVE_K
+
+
+def LoadQuestions(path: str) -> List[str]:
+    """
+    Read questions from a CSV (input/question column), JSONL (input/question key),
+    plain text (one per line) or stdin when path is "-"
+    """
+    if path == "-":
+        return [line.strip() for line in sys.stdin if line.strip()]
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            reader = csv.DictReader(f)
+            column = next((c for c in ("input", "question") if c in (reader.fieldnames or [])), None)
+            if column is None:
+                column = reader.fieldnames[0]
+            return [row[column].strip() for row in reader if row.get(column, "").strip()]
+
+        if path.endswith(".jsonl"):
+            questions = []
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    questions.append((record.get("question") or record.get("input") or "").strip())
+            return [q for q in questions if q]
+
+        return [line.strip() for line in f if line.strip()]
+
+
+def RunBatch(llm, db, questions: List[str], output_path: str, mode: str = "normal",
+             concurrency: int = BATCH_CONCURRENCY) -> Dict[str, Any]:
+    """Answer every question & stream JSONL records to output_path in input order"""
+    start = time.perf_counter()
+    k = LIGHTRAG_K if mode == "rag" else RETRIEVER_K
+
+    print(f"Embedding {len(questions)} questions...")
+    vectors = db.embeddings.embed_documents(questions)
+    results = BatchSimilaritySearch(db, vectors, k)
+    if ADAPTIVE_K:
+        results = [AdaptiveCutoff(r, max_k=k) for r in results]
+    retrieval_s = time.perf_counter() - start
+    print(f"Retrieved documents for {len(questions)} questions in {retrieval_s:.1f}s")
+
+    lightrag = LightRAG(llm, db)
+    prompt = BuildPrompt()
+
+    def answer(index: int) -> Dict[str, Any]:
+        question = questions[index]
+        docs_with_scores = results[index]
+        began = time.perf_counter()
+        record = {"index": index, "question": question}
+        try:
+            if mode == "rag":
+                result = lightrag.generate(question, docs_with_scores=docs_with_scores)
+                record["answer"] = result["answer"]
+                record["sources"] = result["sources"]
+            else:
+                docs = [doc for doc, _ in docs_with_scores]
+                messages = prompt.format_messages(context=CombineDocuments(docs), question=question, history=[])
+                response = SelectModel(llm, question, docs_with_scores).invoke(messages)
+                record["answer"] = response.content if hasattr(response, "content") else str(response)
+                record["sources"] = [
+                    f"{d.metadata.get('source', 'Unknown')} (Page {d.metadata.get('page', '?')})" for d in docs[:3]
+                ]
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_s"] = time.perf_counter() - began
+        return record
+
+    errors = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool, open(output_path, "w", encoding="utf-8") as out:
+        futures = [pool.submit(answer, i) for i in range(len(questions))]
+        #Waiting on futures in submission order keeps the output in input order
+        for future in futures:
+            record = future.result()
+            errors += "error" in record
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            print(f"[{record['index'] + 1}/{len(questions)}] {record['latency_s']:.1f}s")
+
+    total_s = time.perf_counter() - start
+    return {
+        "questions": len(questions),
+        "errors": errors,
+        "retrieval_s": retrieval_s,
+        "total_s": total_s,
+        "questions_per_minute": len(questions) / total_s * 60 if total_s else 0.0,
+        "output": output_path
+    }
@@ -0,0 +1,296 @@
+"""
+Performance benchmarks for the AURA project.
+run using python benchmark.py <benchmark>
+
+Provides:
+- BenchmarkVectorStores(embedding_model, queries, k) -> dict
+- BenchmarkPrefill(model_name, embedding_model, questions, turns) -> dict
+- LoadTranscript(path) -> list[list[dict]]
+- SynthesizeTranscript(questions, words_per_minute) -> list[list[dict]]
+- BenchmarkPrefetch(embedding_model, utterances, k) -> dict
+- BenchmarkWarmup(embedding_model, questions, k) -> dict
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from typing import List, Dict, Any
+
+from config import DEFAULT_EMBEDDING_MODEL, DEFAULT_MODEL, DEFAULT_DOCS_PATH, CHROMA_DIR, MMAP_INDEX_DIR, EVAL_PATH, RETRIEVER_K
+from config import LLM_TEMPERATURE, LLM_TOP_P, LLM_MAX_TOKENS, LLM_NUM_CTX, OLLAMA_KEEP_ALIVE, WARMUP_TRACK_QUERIES
+from memory_governor import ReadRSS
+from warmup import Percentile
+
+
+def _RunStore(backend: str, embedding_model: str, vectors: List[List[float]], k: int, out: "multiprocessing.Queue"):
+    """Load one backend in a clean process & time it"""
+    from langchain_ollama import OllamaEmbeddings
+    from langchain_chroma import Chroma
+    from vector_store import MmapVectorStore
+
+    rss_start = ReadRSS()
+    embeddings = OllamaEmbeddings(model=embedding_model)
+
+    start = time.perf_counter()
+    if backend == "mmap":
+        db = MmapVectorStore(embeddings, MMAP_INDEX_DIR)
+    else:
+        db = Chroma(embedding_function=embeddings, persist_directory=CHROMA_DIR)
+    #The first query pulls the index into memory, count it as part of loading
+    db.similarity_search_by_vector_with_relevance_scores(vectors[0], k=k)
+    load_time = time.perf_counter() - start
+    rss_loaded = ReadRSS()
+
+    latencies = []
+    results = []
+    for vector in vectors:
+        start = time.perf_counter()
+        found = db.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+        latencies.append(time.perf_counter() - start)
+        results.append([doc.page_content for doc, _ in found])
+
+    out.put({
+        "backend": backend,
+        "load_s": load_time,
+        "rss_load_mb": rss_loaded - rss_start,
+        "rss_total_mb": ReadRSS(),
+        "p50_ms": Percentile(latencies, 50) * 1000,
+        "p95_ms": Percentile(latencies, 95) * 1000,
+        "results": results
+    })
+
+
+def BenchmarkVectorStores(embedding_model: str, queries: List[str], k: int = RETRIEVER_K) -> Dict[str, Dict[str, Any]]:
+    """Compare RSS, load time & query latency of Chroma against the mmap index"""
+    from langchain_ollama import OllamaEmbeddings
+    from langchain_chroma import Chroma
+    from vector_store import MmapVectorStore
+
+    embeddings = OllamaEmbeddings(model=embedding_model)
+    if not os.path.exists(os.path.join(MMAP_INDEX_DIR, "index.json")):
+        print(f"Converting {CHROMA_DIR} to {MMAP_INDEX_DIR}...")
+        MmapVectorStore.from_chroma(Chroma(embedding_function=embeddings, persist_directory=CHROMA_DIR), embeddings, MMAP_INDEX_DIR)
+
+    #Embed once up front so only the store itself is timed
+    vectors = embeddings.embed_documents(queries)
+
+    ctx = multiprocessing.get_context("spawn")
+    report = {}
+    for backend in ("chroma", "mmap"):
+        out = ctx.Queue()
+        proc = ctx.Process(target=_RunStore, args=(backend, embedding_model, vectors, k, out))
+        proc.start()
+        report[backend] = out.get()
+        proc.join()
+
+    #How many of Chroma's top-k the quantized index also returns
+    overlap = [
+        len(set(a) & set(b)) / max(1, len(a))
+        for a, b in zip(report["chroma"].pop("results"), report["mmap"].pop("results"))
+    ]
+    report["mmap"]["recall_vs_chroma"] = sum(overlap) / max(1, len(overlap))
+    return report
+
+
+def BenchmarkPrefill(model_name: str, embedding_model: str, questions: List[str], turns: int = 20) -> Dict[str, Dict[str, Any]]:
+    """
+    Replay one multi-turn Normal mode conversation per prompt layout & read Ollama's own
+    prefill timings. prompt_eval_count only counts tokens that missed the KV cache.
+    """
+    import ollama
+    from langchain_core.messages import HumanMessage, AIMessage
+    from database_bridge import InitializeDatabase, CombineDocuments
+    from llm import BuildPrompt
+
+    db = InitializeDatabase(embedding_model, DEFAULT_DOCS_PATH)
+    questions = [questions[i % len(questions)] for i in range(turns)]
+    contexts = [CombineDocuments(db.similarity_search(q, k=RETRIEVER_K)) for q in questions]
+    roles = {"system": "system", "human": "user", "ai": "assistant"}
+    options = {"temperature": LLM_TEMPERATURE, "top_p": LLM_TOP_P, "num_predict": LLM_MAX_TOKENS, "num_ctx": LLM_NUM_CTX}
+
+    report = {}
+    for layout in ("legacy", "prefix_cache"):
+        #Start each layout from a cold model so neither inherits the other's cache
+        ollama.generate(model=model_name, prompt="", keep_alive=0)
+        prompt = BuildPrompt(layout)
+        history = []
+        prefill_ms = []
+        prefill_tokens = []
+
+        for question, context in zip(questions, contexts):
+            messages = prompt.format_messages(context=context, question=question, history=history)
+            response = ollama.chat(
+                model=model_name,
+                messages=[{"role": roles[m.type], "content": m.content} for m in messages],
+                options=options,
+                keep_alive=OLLAMA_KEEP_ALIVE
+            )
+            prefill_ms.append(response.get("prompt_eval_duration", 0) / 1e6)
+            prefill_tokens.append(response.get("prompt_eval_count", 0))
+            history += [HumanMessage(content=question), AIMessage(content=response["message"]["content"])]
+
+        print(f"[{layout}] prefill ms per turn: " + ", ".join(f"{ms:.0f}" for ms in prefill_ms))
+        #The first turn loads the model, leave it out of the averages
+        report[layout] = {
+            "turns": turns,
+            "avg_prefill_ms": sum(prefill_ms[1:]) / max(1, turns - 1),
+            "p95_prefill_ms": Percentile(prefill_ms[1:], 95),
+            "avg_prefill_tokens": sum(prefill_tokens[1:]) / max(1, turns - 1),
+            "total_prefill_s": sum(prefill_ms) / 1000
+        }
+
+    return report
+
+
+def LoadTranscript(path: str) -> List[List[Dict[str, Any]]]:
+    """
+    Load a recorded transcript stream, one JSON event per line:
+    {"t": seconds since utterance start, "text": transcript so far, "final": bool}
+    An event with final=true closes the utterance.
+    """
+    utterances, current = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                current.append(json.loads(line))
+                if current[-1].get("final"):
+                    utterances.append(current)
+                    current = []
+    return utterances
+
+
+def SynthesizeTranscript(questions: List[str], words_per_minute: float = 150) -> List[List[Dict[str, Any]]]:
+    """Word-by-word partial transcripts at a speaking rate, for when no recording is available"""
+    utterances = []
+    for question in questions:
+        words = question.split()
+        events = [{"t": (i + 1) * 60 / words_per_minute, "text": " ".join(words[:i + 1]), "final": False}
+                  for i in range(len(words))]
+        events[-1]["final"] = True
+        utterances.append(events)
+    return utterances
+
+
+def BenchmarkPrefetch(embedding_model: str, utterances: List[List[Dict[str, Any]]], k: int = RETRIEVER_K) -> Dict[str, Dict[str, Any]]:
+    """Time from final transcript to retrieved documents, with & without prefetching partials"""
+    from database_bridge import InitializeDatabase
+    from prefetch import PrefetchingStore
+    from retrieval_cache import RETRIEVAL_CACHE
+
+    db = InitializeDatabase(embedding_model, DEFAULT_DOCS_PATH)
+    report = {}
+    for name in ("final_only", "prefetch"):
+        RETRIEVAL_CACHE.clear()
+        store = PrefetchingStore(db)
+        latencies = []
+        for events in utterances:
+            store.reset()
+            start = time.perf_counter()
+            for event in events:
+                #Replay at the recorded pace
+                time.sleep(max(0.0, event["t"] - (time.perf_counter() - start)))
+                if name == "prefetch" and not event.get("final"):
+                    store.prefetch(event["text"])
+
+            asked = time.perf_counter()
+            store.similarity_search_with_relevance_scores(events[-1]["text"], k=k)
+            latencies.append(time.perf_counter() - asked)
+
+        report[name] = {
+            "utterances": len(utterances),
+            "avg_ms": sum(latencies) / max(1, len(latencies)) * 1000,
+            "p50_ms": Percentile(latencies, 50) * 1000,
+            "p95_ms": Percentile(latencies, 95) * 1000,
+            **store.stats()
+        }
+    return report
+
+
+def _RunFirstQueries(warm: bool, embedding_model: str, questions: List[str], k: int, out: "multiprocessing.Queue"):
+    """
+    Start like the app does (embedding model unloaded), optionally warm up, then time the first queries.
+    The warm-up never replays the timed questions, otherwise they would be cache hits.
+    """
+    from database_bridge import InitializeDatabase
+    from retrieval import RetrieveDocuments
+    from warmup import WarmupQuestions, WarmUp
+
+    db = InitializeDatabase(embedding_model, DEFAULT_DOCS_PATH)
+    warmup_s = WarmUp(db, WarmupQuestions(exclude=questions))["total_s"] if warm else 0.0
+
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        RetrieveDocuments(db, question, k)
+        latencies.append(time.perf_counter() - start)
+
+    out.put({
+        "warmup_s": warmup_s,
+        "first_ms": latencies[0] * 1000 if latencies else 0.0,
+        "p50_ms": Percentile(latencies, 50) * 1000,
+        "p95_ms": Percentile(latencies, 95) * 1000
+    })
+
+
+def BenchmarkWarmup(embedding_model: str, questions: List[str], k: int = RETRIEVER_K) -> Dict[str, Dict[str, Any]]:
+    """
+    Latency of the first queries after a cold start vs after the startup warm-up, each in a fresh process.
+    questions are held out of the warm-up, so the warm run measures warmed models & index pages
+    rather than repeated questions.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    report = {}
+    for name, warm in (("cold", False), ("warm", True)):
+        out = ctx.Queue()
+        proc = ctx.Process(target=_RunFirstQueries, args=(warm, embedding_model, questions, k, out))
+        proc.start()
+        report[name] = out.get()
+        proc.join()
+
+    report["warm"]["p95_improvement_ms"] = report["cold"]["p95_ms"] - report["warm"]["p95_ms"]
+    return report
+
+
+def _EvalQuestions(path: str) -> List[str]:
+    from evaluate import LoadEvalSet
+    return [row["input"] for row in LoadEvalSet(path)]
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="ECEN 214 Lab Assistant - performance benchmarks")
+    parser.add_argument("benchmark", choices=["vectorstore", "prefill", "prefetch", "warmup"], help="Benchmark to run")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL, help="LLM model name")
+    parser.add_argument("-e", "--embedding", default=DEFAULT_EMBEDDING_MODEL, help="Embedding model name")
+    parser.add_argument("--eval", default=EVAL_PATH, help="CSV of questions to replay")
+    parser.add_argument("-k", type=int, default=RETRIEVER_K, help="Documents retrieved per query")
+    parser.add_argument("--turns", type=int, default=20, help="Conversation turns to replay")
+    parser.add_argument("--transcript", help="Recorded transcript stream (JSONL) for the prefetch benchmark")
+    parser.add_argument("--wpm", type=float, default=150, help="Speaking rate when synthesizing a transcript")
+    parser.add_argument("--first", type=int, default=WARMUP_TRACK_QUERIES, help="First queries timed by the warmup benchmark")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from evaluate import PrintReport
+    args = parse_args()
+    if args.benchmark == "vectorstore":
+        PrintReport("Vector store: Chroma vs quantized mmap index",
+                    BenchmarkVectorStores(args.embedding, _EvalQuestions(args.eval), args.k))
+    elif args.benchmark == "prefill":
+        PrintReport("Prefill per turn: legacy vs prefix-cache prompt layout",
+                    BenchmarkPrefill(args.model, args.embedding, _EvalQuestions(args.eval), args.turns))
+    elif args.benchmark == "prefetch":
+        if args.transcript:
+            utterances = LoadTranscript(args.transcript)
+        else:
+            utterances = SynthesizeTranscript(_EvalQuestions(args.eval), args.wpm)
+        PrintReport("Retrieval latency after the final transcript",
+                    BenchmarkPrefetch(args.embedding, utterances, args.k))
+    elif args.benchmark == "warmup":
+        #Time the tail of the eval set, the warm-up tops up from its head & skips these anyway
+        questions = _EvalQuestions(args.eval)
+        PrintReport(f"First {args.first} held-out queries: cold start vs warm-up",
+                    BenchmarkWarmup(args.embedding, questions[max(0, len(questions) - args.first):], args.k))
@@ -0,0 +1,224 @@
+"""
+Compact chunk store for the Chroma backend.
+All chunk text lives in one contiguous memory-mapped UTF-8 blob with a NumPy offset table
+(start, end, source id, page, token count per chunk). Searches only ask Chroma for ids &
+distances, so page contents & metadata are no longer copied out of its SQLite on every
+query. Each hit is a __slots__ ChunkRecord handle & its text is materialized once, when the
+Document for that query is built.
+
+Files in the store directory:
+- text.bin      every chunk's text back to back
+- chunks.npy    one (start, end, source, page, tokens) row per chunk
+- index.json    chunk ids (Chroma ids), source paths & any extra metadata by row
+
+Provides:
+- ChunkRecord Class
+- ChunkStore Class
+- ChunkStoreVectorStore Class
+- ChunkWords(doc) -> frozenset
+"""
+
+import os
+import json
+import mmap
+import shutil
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Tuple, Dict, Any, Optional
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from vector_store import WrappedVectorStore
+from config import CHUNK_STORE_DIR, CHUNK_WORDS_CACHE
+
+CHUNK_DTYPE = np.dtype([("start", "<i8"), ("end", "<i8"), ("source", "<i4"), ("page", "<i4"), ("tokens", "<i4")])
+
+
+class ChunkRecord:
+    """Handle to one chunk, text stays in the blob until asked for"""
+    __slots__ = ("row", "chunk_id", "source_id", "page", "start", "end", "tokens")
+
+    def __init__(self, row: int, chunk_id: str, source_id: int, page: int, start: int, end: int, tokens: int):
+        self.row = row
+        self.chunk_id = chunk_id
+        self.source_id = source_id
+        self.page = page
+        self.start = start
+        self.end = end
+        self.tokens = tokens
+
+
+class ChunkStore:
+    """Memory-mapped chunk texts with an offset table, looked up by Chroma id"""
+
+    def __init__(self, directory: str = CHUNK_STORE_DIR):
+        self.directory = directory
+        self.table = None
+        self.blob = None
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.sources: List[str] = []
+        self.extras: Dict[int, Dict[str, Any]] = {}
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def load(self):
+        """Map the store files if they exist"""
+        if not os.path.exists(self._path("index.json")):
+            return
+        with open(self._path("index.json")) as f:
+            info = json.load(f)
+        self.ids = info["ids"]
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.sources = info["sources"]
+        self.extras = {int(row): extra for row, extra in info["extras"].items()}
+        if not self.ids:
+            return
+        self.table = np.load(self._path("chunks.npy"), mmap_mode="r")
+        with open(self._path("text.bin"), "rb") as f:
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self.blob is not None:
+            self.blob.close()
+        self.table = self.blob = None
+
+    @classmethod
+    def build(cls, ids: List[str], texts: List[str], metadatas: List[Optional[dict]],
+              directory: str = CHUNK_STORE_DIR) -> "ChunkStore":
+        """Write a fresh store, replacing anything in directory"""
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory, exist_ok=True)
+
+        table = np.zeros(len(ids), dtype=CHUNK_DTYPE)
+        sources: Dict[str, int] = {}
+        extras: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        with open(os.path.join(directory, "text.bin"), "wb") as f:
+            for row, (text, metadata) in enumerate(zip(texts, metadatas)):
+                data = (text or "").encode("utf-8")
+                f.write(data)
+                metadata = dict(metadata or {})
+                source = str(metadata.pop("source", "Unknown"))
+                page = metadata.pop("page", -1)
+                if not isinstance(page, int):
+                    metadata["page"] = page
+                    page = -1
+                #Same estimate as the eval tooling, ~4 characters per token
+                table[row] = (offset, offset + len(data), sources.setdefault(source, len(sources)), page, len(text or "") // 4)
+                offset += len(data)
+                if metadata:
+                    extras[str(row)] = metadata
+
+        np.save(os.path.join(directory, "chunks.npy"), table)
+        #Index last, a store without it is treated as missing
+        with open(os.path.join(directory, "index.json"), "w") as f:
+            json.dump({"ids": list(ids), "sources": list(sources), "extras": extras}, f)
+        return cls(directory)
+
+    @classmethod
+    def from_chroma(cls, chroma: VectorStore, directory: str = CHUNK_STORE_DIR) -> "ChunkStore":
+        """Copy every chunk out of a Chroma collection once"""
+        data = chroma.get(include=["documents", "metadatas"])
+        return cls.build(data["ids"], data["documents"], data["metadatas"], directory)
+
+    @classmethod
+    def for_chroma(cls, chroma: VectorStore, directory: str = CHUNK_STORE_DIR, rebuild: bool = False) -> "ChunkStore":
+        """Load the store for a collection, rebuilding it when missing or out of date"""
+        store = cls(directory)
+        if rebuild or len(store) != chroma._collection.count():
+            store.close()
+            print(f"Building chunk store in {directory}...")
+            store = cls.from_chroma(chroma, directory)
+        return store
+
+    def record(self, chunk_id: str) -> Optional[ChunkRecord]:
+        """Handle for a chunk id, None if the store doesn't know it"""
+        row = self.rows.get(chunk_id)
+        if row is None:
+            return None
+        start, end, source, page, tokens = self.table[row].tolist()
+        return ChunkRecord(row, chunk_id, source, page, start, end, tokens)
+
+    def text(self, record: ChunkRecord) -> str:
+        return self.blob[record.start:record.end].decode("utf-8")
+
+    def document(self, record: ChunkRecord) -> Document:
+        """Materialize a chunk as a Document, the only place its text is copied"""
+        metadata = {"source": self.sources[record.source_id], "chunk_id": record.chunk_id, "tokens": record.tokens}
+        if record.page >= 0:
+            metadata["page"] = record.page
+        metadata.update(self.extras.get(record.row, {}))
+        return Document(page_content=self.text(record), metadata=metadata)
+
+
+class ChunkStoreVectorStore(WrappedVectorStore):
+    """
+    Chroma front end that searches by id & distance only & reads texts from a ChunkStore.
+    Falls back to a regular Chroma search for unsupported arguments or unknown ids.
+    """
+
+    def __init__(self, inner: VectorStore, store: ChunkStore):
+        super().__init__(inner)
+        self.store = store
+
+    def _resolve(self, ids: List[str], distances: List[float]) -> Optional[List[Tuple[Document, float]]]:
+        relevance = self.inner._select_relevance_score_fn()
+        records = [self.store.record(chunk_id) for chunk_id in ids]
+        if any(record is None for record in records):
+            return None
+        return [(self.store.document(record), relevance(d)) for record, d in zip(records, distances)]
+
+    def _query(self, vectors: List[List[float]], k: int, where: Optional[dict] = None) -> Dict[str, Any]:
+        return self.inner._collection.query(query_embeddings=vectors, n_results=k, where=where, include=["distances"])
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        if set(kwargs) - {"filter"}:
+            return self.inner.similarity_search_with_relevance_scores(query, k=k, **kwargs)
+
+        results = self._query([self.embeddings.embed_query(query)], k, kwargs.get("filter"))
+        found = self._resolve(results["ids"][0], results["distances"][0])
+        if found is None:
+            print("Warning: Chunk store is out of date, rebuild the database")
+            return self.inner.similarity_search_with_relevance_scores(query, k=k, **kwargs)
+        return found
+
+    def batch_similarity_search_with_relevance_scores(self, vectors: List[List[float]], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        if not vectors:
+            return []
+        results = self._query(vectors, k)
+        batch = [self._resolve(ids, distances) for ids, distances in zip(results["ids"], results["distances"])]
+        if any(found is None for found in batch):
+            return super().batch_similarity_search_with_relevance_scores(vectors, k)
+        return batch
+
+
+_words: "OrderedDict[str, frozenset]" = OrderedDict()
+_words_lock = threading.Lock()
+
+
+def ChunkWords(doc: Document) -> frozenset:
+    """Lowercased word set of a chunk, cached by chunk id so repeat hits aren't re-split"""
+    chunk_id = doc.metadata.get("chunk_id")
+    if chunk_id is None:
+        return frozenset(doc.page_content.lower().split())
+
+    with _words_lock:
+        words = _words.get(chunk_id)
+        if words is not None:
+            _words.move_to_end(chunk_id)
+            return words
+
+    words = frozenset(doc.page_content.lower().split())
+    with _words_lock:
+        _words[chunk_id] = words
+        while len(_words) > CHUNK_WORDS_CACHE:
+            _words.popitem(last=False)
+    return words
@@ -0,0 +1,163 @@
+"""
+Structure-aware chunking for lecture slides & lab handouts.
+PyPDFLoader already returns one Document per page, so pages are never merged.
+Within a page the text is grouped into blocks (headings, numbered steps, equations,
+tables, plain text) & blocks are packed into chunks without ever being cut apart.
+
+Provides:
+- LayoutSplitter Class
+- SplitPages(pages, chunk_size, max_chunk_size) -> List[Document]
+"""
+
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP, LAYOUT_MAX_CHUNK_SIZE, CHUNK_WORKERS
+
+#Line patterns used to find the layout of a page
+STEP_PATTERN = re.compile(r"^\s*(\(?\d{1,2}[.)]|\(?[a-hA-H][.)]|[ivx]{1,4}[.)]|step\s+\d+[:.]?|[•●▪◦\-\*])\s+", re.IGNORECASE)
+HEADING_PATTERN = re.compile(r"^(\d+(\.\d+)*\.?\s+)?[A-Z][\w\s&/()'’,-]{0,60}$")
+EQUATION_PATTERN = re.compile(r"[=≈≤≥∑∫√Ω∠]|\b[A-Za-z]\s*[*/^]\s*[A-Za-z0-9(]")
+TABLE_CELL_SPLIT = re.compile(r"\t|\s{2,}")
+NUMBER_PATTERN = re.compile(r"^[-+]?\d+(\.\d+)?[a-zA-ZΩµ%]*$")
+
+
+def _LineKind(line: str) -> str:
+    """Classify a single line of page text"""
+    stripped = line.strip()
+    if not stripped:
+        return "blank"
+
+    cells = [c for c in TABLE_CELL_SPLIT.split(stripped) if c]
+    numbers = sum(1 for token in stripped.split() if NUMBER_PATTERN.match(token))
+    if len(cells) >= 3 or (numbers >= 3 and numbers >= len(stripped.split()) / 2):
+        return "table"
+
+    if STEP_PATTERN.match(stripped):
+        return "step"
+
+    if len(stripped) <= 120 and EQUATION_PATTERN.search(stripped):
+        return "equation"
+
+    words = stripped.split()
+    capitalized = sum(1 for w in words if w[0].isupper() or w[0].isdigit())
+    if (len(words) <= 8 and HEADING_PATTERN.match(stripped) and not stripped.endswith((",", ";", ":"))
+            and (stripped.isupper() or capitalized >= 0.6 * len(words))):
+        return "heading"
+
+    return "text"
+
+
+def _PageBlocks(text: str) -> List[Tuple[str, str]]:
+    """Group page lines into (kind, text) blocks that must stay together"""
+    blocks: List[Tuple[str, List[str]]] = []
+
+    for line in text.splitlines():
+        kind = _LineKind(line)
+        if kind == "blank":
+            #Blank lines close paragraphs but not equations or tables
+            if blocks and blocks[-1][0] == "text":
+                blocks.append(("break", []))
+            continue
+
+        prev = blocks[-1][0] if blocks else None
+
+        if kind in ("equation", "table") and prev in ("equation", "table", "step", "text"):
+            #Keep an equation/table attached to the line that introduces it
+            blocks[-1][1].append(line.rstrip())
+        elif kind == "text" and prev in ("step", "text", "equation"):
+            #Wrapped continuation of the previous step/paragraph
+            blocks[-1][1].append(line.rstrip())
+        else:
+            blocks.append((kind, [line.rstrip()]))
+
+    return [(kind, "\n".join(lines)) for kind, lines in blocks if lines]
+
+
+def SplitPages(pages: List[Document], chunk_size: int = CHUNK_SIZE,
+               max_chunk_size: int = LAYOUT_MAX_CHUNK_SIZE) -> List[Document]:
+    """Split page Documents into layout-aware chunks, never crossing page boundaries"""
+    fallback = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=CHUNK_OVERLAP)
+    chunks = []
+
+    for page in pages:
+        section = None
+        current: List[str] = []
+        current_len = 0
+        current_section = None
+
+        def flush():
+            nonlocal current, current_len
+            if current:
+                metadata = dict(page.metadata)
+                if current_section:
+                    metadata["section"] = current_section
+                chunks.append(Document(page_content="\n".join(current), metadata=metadata))
+            current, current_len = [], 0
+
+        for kind, text in _PageBlocks(page.page_content):
+            if kind == "heading":
+                #Start a new chunk at a heading once the current one has some substance
+                if current_len >= chunk_size // 3:
+                    flush()
+                section = text.strip()
+
+            if len(text) > max_chunk_size:
+                #A single block too large to keep whole, fall back to character splitting
+                flush()
+                for piece in fallback.split_text(text):
+                    current_section = section
+                    current, current_len = [piece], len(piece)
+                    flush()
+                continue
+
+            if current and current_len + len(text) + 1 > chunk_size:
+                flush()
+
+            if not current:
+                current_section = section
+            current.append(text)
+            current_len += len(text) + 1
+
+        flush()
+
+    return chunks
+
+
+class LayoutSplitter:
+    """
+    Drop-in replacement for RecursiveCharacterTextSplitter.split_documents on PDF pages.
+    Files are chunked in parallel worker processes, output keeps the original file order.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, max_chunk_size: int = LAYOUT_MAX_CHUNK_SIZE,
+                 workers: int = CHUNK_WORKERS):
+        self.chunk_size = chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.workers = workers
+
+    def split_documents(self, docs: List[Document]) -> List[Document]:
+        """Split page documents, grouped per source file"""
+        files: dict = {}
+        for doc in docs:
+            files.setdefault(doc.metadata.get("source", ""), []).append(doc)
+        groups = list(files.values())
+
+        if self.workers <= 1 or len(groups) <= 1:
+            results = [SplitPages(group, self.chunk_size, self.max_chunk_size) for group in groups]
+        else:
+            #Spawned, not forked: the UI calls this with governor & warm-up threads running,
+            #& a forked child can inherit a lock one of them was holding
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                results = list(pool.map(
+                    SplitPages,
+                    groups,
+                    [self.chunk_size] * len(groups),
+                    [self.max_chunk_size] * len(groups)
+                ))
+
+        return [chunk for result in results for chunk in result]
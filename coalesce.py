@@ -0,0 +1,150 @@
+"""
+Single-flight coalescing of identical in-flight queries.
+When a lab section asks the same question at once, the first request runs retrieval &
+generation & every concurrent request with the same normalized key waits for that run.
+Streamed answers are buffered & replayed to every waiter chunk by chunk.
+
+Provides:
+- NormalizeQuery(query) -> str
+- SingleFlight Class
+- CoalesceChain(chain, name, coalescer) -> Runnable
+- QUERY_COALESCER (process-wide SingleFlight)
+"""
+
+import contextvars
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+from langchain_core.runnables import Runnable, RunnableGenerator
+
+
+def NormalizeQuery(query: str) -> str:
+    """Case, whitespace & trailing punctuation insensitive form of a query"""
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+
+class _Flight:
+    """Shared state for one running call & its waiters"""
+    __slots__ = ("cond", "chunks", "result", "error", "finished")
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks: List[Any] = []
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.finished = False
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time, concurrent callers with the same key share it.
+    Only in-flight calls are shared, nothing is cached once a call finishes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights: Dict[Hashable, _Flight] = {}
+        self.counters = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def _join(self, key: Hashable):
+        """Return (flight, is_leader) for key"""
+        with self.lock:
+            self.counters["calls"] += 1
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.counters["coalesced"] += 1
+                return flight, False
+            flight = _Flight()
+            self.flights[key] = flight
+            self.counters["executions"] += 1
+            return flight, True
+
+    def _finish(self, key: Hashable, flight: _Flight):
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        with flight.cond:
+            flight.finished = True
+            flight.cond.notify_all()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Call fn once for all concurrent callers of key & return its result to each"""
+        flight, leader = self._join(("do", key))
+        if leader:
+            try:
+                flight.result = fn()
+            except BaseException as e:
+                flight.error = e
+            finally:
+                self._finish(("do", key), flight)
+        else:
+            with flight.cond:
+                flight.cond.wait_for(lambda: flight.finished)
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, key: Hashable, fn: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Run the iterator from fn once & replay every chunk to all concurrent callers of key"""
+        flight, leader = self._join(("stream", key))
+        if leader:
+            #The producer runs on its own thread so a caller that stops reading never stalls the rest
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._produce, ("stream", key), flight, fn), daemon=True
+            ).start()
+
+        index = 0
+        while True:
+            with flight.cond:
+                flight.cond.wait_for(lambda: index < len(flight.chunks) or flight.finished)
+                chunks = flight.chunks[index:]
+                finished = flight.finished
+            index += len(chunks)
+            yield from chunks
+            if finished:
+                break
+
+        if flight.error is not None:
+            raise flight.error
+
+    def _produce(self, key: Hashable, flight: _Flight, fn: Callable[[], Iterator[Any]]):
+        try:
+            for chunk in fn():
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            self._finish(key, flight)
+
+    def stats(self) -> Dict[str, int]:
+        """calls seen, executions actually run & coalesced calls saved"""
+        with self.lock:
+            return dict(self.counters)
+
+
+QUERY_COALESCER = SingleFlight()
+
+
+def _HistoryKey(history: List[Any]) -> tuple:
+    return tuple((getattr(m, "type", ""), getattr(m, "content", str(m))) for m in history)
+
+
+def CoalesceChain(chain: Runnable, name: str = "", coalescer: Optional[SingleFlight] = None) -> Runnable:
+    """
+    Wrap a Normal mode chain that takes {"question", "history"} so concurrent turns with the same
+    normalized question & the same history share one retrieval & one generation.
+    Supports invoke & stream, RunnableWithMessageHistory still records the turn in every session.
+    """
+    coalescer = coalescer or QUERY_COALESCER
+
+    def coalesced(inputs: Iterator[Dict[str, Any]]) -> Iterator[Any]:
+        payload: Dict[str, Any] = {}
+        for chunk in inputs:
+            payload.update(chunk)
+        key = (name, NormalizeQuery(payload["question"]), _HistoryKey(payload.get("history", [])))
+        yield from coalescer.stream(key, lambda: chain.stream(payload))
+
+    return RunnableGenerator(coalesced)
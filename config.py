@@ -29,6 +29,23 @@ Question: {question}
 
 Answer (be direct and factual):"""
 
+#Prefix-cache layout for standard RAG: the system message & history never change between turns,
+#so Ollama can reuse its KV cache for them. Retrieved context rides in the newest human message.
+ANSWER_SYSTEM_PROMPT = """You are answering questions about ECEN 214 lab procedures and concepts.
+
+Use ONLY the information in the context given with each question. Do not add outside knowledge or make assumptions.
+If the context does not contain the answer, say "The provided documents do not contain this information."
+
+Present facts directly. Do not use phrases like "it appears that" or "based on the evidence" - just state the information.
+For calculations, show clear steps using the formulas from the context."""
+
+ANSWER_CONTEXT_PROMPT = """Context:
+{context}
+
+Question: {question}
+
+Answer (be direct and factual):"""
+
 #LightRAG vectorization requests a different type of prompting
 LIGHTRAG_PROMPT = """Answer the question using the evidence provided below. If the evidence is missing
 necessary formulas or concepts, use standard domain knowledge such as Ohm's Law 
@@ -58,21 +75,126 @@ Direct answer:
 CHUNK_SIZE = 600
 CHUNK_OVERLAP = 100
 
+#Layout-aware chunking for PDFs (pages, headings, numbered steps, equations & tables)
+#Off until evaluate.py chunking shows a gain, on ECEN_214_Docs it gives 742 chunks vs 684 recursive
+LAYOUT_CHUNKING = False
+LAYOUT_MAX_CHUNK_SIZE = 1200  # Blocks larger than this fall back to character splitting
+CHUNK_WORKERS = 4             # Worker processes used to chunk files in parallel
+
+#Parsed PDF pages cached by content hash, unchanged PDFs are never re-parsed on rebuild
+PARSE_CACHE = True
+
+#Adaptive retrieval depth, RETRIEVER_K & LIGHTRAG_K become the upper bounds
+#Off until evaluate.py adaptive shows no accuracy loss with these thresholds on the relevance scale
+ADAPTIVE_K = False
+ADAPTIVE_MIN_K = 2          # Always keep at least this many chunks
+ADAPTIVE_MIN_SCORE = 0.25   # Drop chunks under this relevance score
+ADAPTIVE_MAX_DROP = 0.15    # Drop chunks scoring this far below the best chunk
+ADAPTIVE_GAP = 0.05         # Stop at the first score gap this large between neighbours
+
+#Parent/child (small-to-big) retrieval, children are embedded & parents returned
+#Parents pack consecutive PDF pages, on ECEN_214_Docs: 187 parents & 604 children vs 684 plain chunks
+PARENT_CHILD_RETRIEVAL = False  # Requires a rebuild (--reload) after switching on
+PARENT_CHUNK_SIZE = 2000
+CHILD_CHUNK_SIZE = 600
+CHILD_CHUNK_OVERLAP = 0
+CHILD_MIN_CHARS = 40            # Smaller children (page numbers, footers) are not embedded
+PARENT_MAX_RESULTS = 4          # Parents returned per query, k still sets children searched
+
 #Adjust based on how many docs each should retrieve
 RETRIEVER_K = 8
 LIGHTRAG_K = 6
 
+#Batch question answering (app.py --batch), Ollama only runs requests in parallel up to OLLAMA_NUM_PARALLEL
+BATCH_CONCURRENCY = 4
+
+#Speculative retrieval on partial voice transcripts
+PREFETCH_K = 12                  # Candidates kept warm, covers RETRIEVER_K & LIGHTRAG_K
+PREFETCH_MIN_WORDS = 3           # Stable words needed before the first prefetch
+PREFETCH_MIN_NEW_WORDS = 2       # New words needed before prefetching again
+PREFETCH_REUSE_THRESHOLD = 0.85  # Word similarity of final vs prefetched text to reuse results
+
+#Retrieval result cache, invalidated automatically whenever the database is rebuilt
+RETRIEVAL_CACHE_ENABLED = True
+RETRIEVAL_CACHE_SIZE = 256      # Cached (query, k, filters) results
+RETRIEVAL_CACHE_TTL = 1800.0    # Seconds a cached result stays valid
+
+#Vector store backend: "chroma" (default) or "mmap" (quantized memory-mapped index for edge devices)
+VECTOR_BACKEND = "chroma"
+MMAP_INDEX_DTYPE = "int8"   # "int8" (4x smaller than float32) or "float16"
+MMAP_SEARCH_BLOCK = 4096    # Rows scored per block during brute-force search
+
+#Compact chunk store for the Chroma backend (texts in one mmap blob, Chroma only returns ids)
+CHUNK_STORE = True
+CHUNK_WORDS_CACHE = 4096    # Chunks whose word sets are kept for LightRAG overlap scoring
+
 #Models Used
 DEFAULT_MODEL = "llama3.2:1b"  # Use Llama3.2 3B model per Vishuam, ensure the parameters
 DEFAULT_EMBEDDING_MODEL = "nomic-embed-text"
 
+#Model provisioning (model.ProvisionModels), checks & pulls every model the app needs at startup
+PROVISION_WORKERS = 3       # Models pulled at the same time
+PROVISION_RETRIES = 4       # Attempts per model, Ollama resumes partially downloaded layers
+PROVISION_BACKOFF = 2.0     # Seconds before the first retry, doubled after each failure
+PROVISION_TIMEOUT = 120.0   # Seconds without a progress update before a stalled pull is retried
+
 # LM parameters for better output
 LLM_TEMPERATURE = 0.05  # Low temperature = more factual
 LLM_TOP_P = 0.85        # Reduced randomness
 LLM_MAX_TOKENS = 512   # Reasonable response length
+LLM_NUM_CTX = 4096     # Fixed context window, changing it forces Ollama to reload the model
+
+#Model cascade (app.py --router, UI toggle), DEFAULT_MODEL answers easy questions & ROUTER_LARGE_MODEL hard ones
+ROUTER_ENABLED = False
+ROUTER_LARGE_MODEL = "llama3.2:3b"
+ROUTER_MAX_WORDS = 30           # Questions longer than this go to the large model
+ROUTER_MIN_SCORE = 0.4          # As do questions whose best chunk scores under this
+ROUTER_CALC_KEYWORDS = ["calculate", "compute", "solve", "determine", "derive", "find the", "how much",
+                        "how many", "given", "value of"]
+ROUTER_ESCALATE_OVERLAP = 0.05  # LightRAG re-asks the large model when no evidence overlaps the answer this much, 0 disables
+
+#Prompt assembly for Normal mode: "prefix_cache" (static prefix, context last) or "legacy" (context in system prompt)
+PROMPT_LAYOUT = "prefix_cache"
+OLLAMA_KEEP_ALIVE = "30m"  # Keep the chat model (& its prompt cache) loaded between turns
+
+#Memory governor, cleans up on a background thread only when a threshold is crossed
+MEMORY_CHECK_INTERVAL = 5.0     # Seconds between memory samples
+MEMORY_RSS_SOFT_MB = 1500       # Process RSS that triggers garbage collection
+MEMORY_DEVICE_SOFT_MB = 1024    # Reserved CUDA memory that triggers releasing the torch cache
+MEMORY_AVAILABLE_MIN_MB = 700   # System memory floor (shared with the GPU on Jetson) that triggers model unloads
+MEMORY_ACTION_COOLDOWN = 30.0   # Seconds before a threshold can trigger the same action again
+MEMORY_MAX_COOLDOWN = 600.0     # Cooldown doubles up to this while an action frees nothing
+MEMORY_MIN_FREED_MB = 1.0       # Less than this freed counts as nothing
+#Ollama models unloaded under pressure, reloaded on next use. None unloads every loaded model
+#the app doesn't keep (MemoryGovernor.keep: the chat & embedding models every query needs), so an
+#idle router large model or a model left over from a switch goes first. A list limits it to those
+MEMORY_UNLOAD_MODELS = None
+
+#Startup warm-up, replays frequent session & eval questions before reporting ready
+WARMUP_ENABLED = True
+WARMUP_QUESTIONS = 20       # Questions replayed through retrieval
+WARMUP_CONCURRENCY = 2      # Warm-up retrievals in flight
+WARMUP_GENERATE = 0         # Of those, how many are also answered (loads the chat model & prompt prefix)
+WARMUP_TRACK_QUERIES = 10   # First real queries timed to measure the warm-up benefit
+
+#Query path profiling (app.py --profile, UI toggle)
+PROFILE_QUERIES = 5        # Queries profiled per mode before the report is printed
+PROFILE_INTERVAL = 0.005   # Seconds between stack samples
 
 #Make sure these always align with folders in local/remote DB
 DEFAULT_DOCS_PATH = "ECEN_214_Docs"
 STORAGE_DIR = "storage"
 CHROMA_DIR = "storage/chroma"
-SESSIONS_DIR = "storage/sessions"
\ No newline at end of file
+SESSIONS_DIR = "storage/sessions"
+SESSION_INDEX_PATH = "storage/sessions.sqlite"
+PARENT_DOCSTORE_PATH = "storage/parents.sqlite"
+MMAP_INDEX_DIR = "storage/mmap_index"
+CHUNK_STORE_DIR = "storage/chunk_store"
+INDEX_GENERATION_PATH = "storage/index_generation"
+PARSE_CACHE_DIR = "storage/parse_cache"
+PROFILE_DIR = "storage/profiles"
+WARMUP_STATS_PATH = "storage/warmup_stats.jsonl"
+
+#Evaluation set & scoring
+EVAL_PATH = "ecen214_eval.csv"
+EVAL_RECALL_THRESHOLD = 0.5  # Fraction of expected answer key terms needed to count as correct
\ No newline at end of file
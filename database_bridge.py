@@ -5,6 +5,9 @@ later for feedback/record keeping.
 
 Provides:
 - CombineDocuments(docs) -> str
+- SplitDocuments(docs) -> List[Document]
+- WrapDatabase(db, rebuilt=False) -> VectorStore
+- DatabaseExists(backend) -> bool
 - PullDocuments(documentPath) -> List[Document]
 - PushDocuments(model_name, documentPath, reload=False) -> Chroma
 - SaveSession(session_data, session_id=None) -> str (outputs file name)
@@ -23,14 +26,24 @@ from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader, T
 
 from langchain_core.documents import Document
 from langchain_core.prompts import format_document
+from langchain_core.vectorstores import VectorStore
 from langchain_ollama import OllamaEmbeddings
 from langchain_chroma import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import torch
 
-from config import DEFAULT_DOC_PROMPT, CHUNK_SIZE, CHUNK_OVERLAP, CHROMA_DIR, STORAGE_DIR, SESSIONS_DIR
+from chunking import LayoutSplitter
+from parent_child import ParentDocstore, ParentChildStore, BuildParentChildDocuments
+from vector_store import MmapVectorStore
+from chunk_store import ChunkStore, ChunkStoreVectorStore
+from retrieval_cache import CachedVectorStore, BumpIndexGeneration
+from parse_cache import LoadPDFs
+from config import DEFAULT_DOC_PROMPT, CHUNK_SIZE, CHUNK_OVERLAP, CHROMA_DIR, STORAGE_DIR, SESSIONS_DIR, LAYOUT_CHUNKING, CHUNK_WORKERS
+from config import PARENT_CHILD_RETRIEVAL, PARENT_DOCSTORE_PATH, VECTOR_BACKEND, MMAP_INDEX_DIR, CHUNK_STORE, CHUNK_STORE_DIR
+from config import RETRIEVAL_CACHE_ENABLED, PARSE_CACHE
 
 SPLITTER = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+LAYOUT_SPLITTER = LayoutSplitter(chunk_size=CHUNK_SIZE)
 
 def ClearCudaCache():
     """Clear CUDA cache to free GPU memory"""
@@ -52,13 +65,25 @@ def CombineDocuments(docs: List[Document]) -> str:
     return "\n\n".join(formatted)
 
 
+def SplitDocuments(docs: List[Document], layout: bool = LAYOUT_CHUNKING) -> List[Document]:
+    """Split loaded documents into chunks, PDFs use the layout-aware splitter when enabled"""
+    if not layout:
+        return SPLITTER.split_documents(docs)
+
+    pdf_docs = [d for d in docs if str(d.metadata.get("source", "")).lower().endswith(".pdf")]
+    other_docs = [d for d in docs if not str(d.metadata.get("source", "")).lower().endswith(".pdf")]
+
+    return LAYOUT_SPLITTER.split_documents(pdf_docs) + SPLITTER.split_documents(other_docs)
+
+
 def LoadDocuments(path: str) -> List[Document]:
     """Load documents from directory"""
     if not os.path.exists(path):
         raise FileNotFoundError(f"Path does not exist: {path}")
     
     loaders = {
-        ".pdf": DirectoryLoader(path, glob="**/*.pdf", loader_cls=PyPDFLoader, show_progress=True),
+        ".pdf": DirectoryLoader(path, glob="**/*.pdf", loader_cls=PyPDFLoader, show_progress=True,
+                                use_multithreading=True, max_concurrency=CHUNK_WORKERS),
         ".txt": DirectoryLoader(path, glob="**/*.txt", loader_cls=TextLoader, show_progress=True),
         ".md": DirectoryLoader(path, glob="**/*.md", loader_cls=TextLoader, show_progress=True)
         # ".docx": DirectoryLoader(path, glob="**/*.docx", loader_cls=UnstructuredWordDocumentLoader, show_progress=True)
@@ -67,7 +92,11 @@ def LoadDocuments(path: str) -> List[Document]:
     docs = []
     for file_type, loader in loaders.items():
         try:
-            loaded = loader.load()
+            if file_type == ".pdf" and PARSE_CACHE:
+                # Unchanged PDFs come from the parse cache instead of PyPDF
+                loaded = LoadPDFs(path)
+            else:
+                loaded = loader.load()
             docs.extend(loaded)
             if loaded:
                 print(f"Loaded {len(loaded)} {file_type} files")
@@ -80,6 +109,21 @@ def LoadDocuments(path: str) -> List[Document]:
     return docs
 
 
+def WrapDatabase(db: VectorStore, rebuilt: bool = False) -> VectorStore:
+    """Apply the configured retrieval layers on top of the base vector store"""
+    if CHUNK_STORE and isinstance(db, Chroma):
+        # The mmap backend already reads texts from its own memory-mapped file
+        db = ChunkStoreVectorStore(db, ChunkStore.for_chroma(db, CHUNK_STORE_DIR, rebuild=rebuilt))
+    if PARENT_CHILD_RETRIEVAL:
+        if os.path.exists(PARENT_DOCSTORE_PATH):
+            db = ParentChildStore(db, ParentDocstore(PARENT_DOCSTORE_PATH))
+        else:
+            print("Warning: Parent docstore missing, rebuild the database to enable parent/child retrieval")
+    if RETRIEVAL_CACHE_ENABLED:
+        db = CachedVectorStore(db)
+    return db
+
+
 def kill_ollama(model: str):
     """Stop the Ollama instance for the given model."""
     try:
@@ -88,13 +132,22 @@ def kill_ollama(model: str):
     except Exception as e:
         print(f"Warning: Failed to stop Ollama: {e}")
 
-def InitializeDatabase(embedding_model: str, docs_path: str, force_reload: bool = False) -> Chroma:
-    """Initialize or load the Chroma vector database, then shut down Ollama."""
+def DatabaseExists(backend: str = VECTOR_BACKEND) -> bool:
+    """Return True if there is a persisted database the backend can load"""
+    chroma_exists = os.path.isdir(CHROMA_DIR) and len(os.listdir(CHROMA_DIR)) > 0
+    if backend == "mmap":
+        # An existing Chroma database can be converted without re-embedding
+        return os.path.exists(os.path.join(MMAP_INDEX_DIR, "index.json")) or chroma_exists
+    return chroma_exists
+
+def InitializeDatabase(embedding_model: str, docs_path: str, force_reload: bool = False,
+                       backend: str = VECTOR_BACKEND) -> VectorStore:
+    """Initialize or load the vector database (Chroma or mmap), then shut down Ollama."""
     
     os.makedirs(STORAGE_DIR, exist_ok=True)
     os.makedirs(CHROMA_DIR, exist_ok=True)
 
-    db_exists = os.path.isdir(CHROMA_DIR) and len(os.listdir(CHROMA_DIR)) > 0
+    db_exists = DatabaseExists(backend)
 
     # Always instantiate embeddings once
     embeddings = OllamaEmbeddings(model=embedding_model)
@@ -106,17 +159,31 @@ def InitializeDatabase(embedding_model: str, docs_path: str, force_reload: bool
         if not raw_docs:
             raise ValueError(f"No documents found in {docs_path}")
 
-        chunks = SPLITTER.split_documents(raw_docs)
-        print(f"Created {len(chunks)} chunks")
+        if PARENT_CHILD_RETRIEVAL:
+            parents, chunks = BuildParentChildDocuments(raw_docs)
+            ParentDocstore(PARENT_DOCSTORE_PATH).replace(parents)
+            print(f"Created {len(parents)} parent sections & {len(chunks)} child chunks")
+        else:
+            chunks = SplitDocuments(raw_docs)
+            print(f"Created {len(chunks)} chunks")
         print("Generating embeddings...")
 
-        db = Chroma.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            persist_directory=CHROMA_DIR
-        )
+        if backend == "mmap":
+            db = MmapVectorStore.from_documents(
+                documents=chunks,
+                embedding=embeddings,
+                persist_directory=MMAP_INDEX_DIR
+            )
+        else:
+            db = Chroma.from_documents(
+                documents=chunks,
+                embedding=embeddings,
+                persist_directory=CHROMA_DIR
+            )
         print("Database created and saved")
-        return db
+        # Cached retrievals from the previous index are stale in every process now
+        BumpIndexGeneration()
+        return WrapDatabase(db, rebuilt=True)
 
     if force_reload:
         print("Force reload requested – rebuilding database.")
@@ -125,15 +192,23 @@ def InitializeDatabase(embedding_model: str, docs_path: str, force_reload: bool
         return db
 
     if db_exists:
-        print(f"Loading existing database from {CHROMA_DIR}")
         try:
-            db = Chroma(
-                embedding_function=embeddings,
-                persist_directory=CHROMA_DIR
-            )
+            if backend == "mmap" and os.path.exists(os.path.join(MMAP_INDEX_DIR, "index.json")):
+                print(f"Loading existing index from {MMAP_INDEX_DIR}")
+                db = MmapVectorStore(embeddings, MMAP_INDEX_DIR)
+            elif backend == "mmap":
+                print(f"Converting existing database in {CHROMA_DIR} to {MMAP_INDEX_DIR}")
+                chroma = Chroma(embedding_function=embeddings, persist_directory=CHROMA_DIR)
+                db = MmapVectorStore.from_chroma(chroma, embeddings, MMAP_INDEX_DIR)
+            else:
+                print(f"Loading existing database from {CHROMA_DIR}")
+                db = Chroma(
+                    embedding_function=embeddings,
+                    persist_directory=CHROMA_DIR
+                )
             print("Database loaded successfully")
             kill_ollama(embedding_model)
-            return db
+            return WrapDatabase(db)
         except Exception as e:
             print(f"Error loading existing database: {e}")
             print("Falling back to rebuild...")
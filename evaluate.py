@@ -0,0 +1,257 @@
+"""
+Evaluation harness for the AURA project, scored against the ecen214_eval.csv question set.
+run using python evaluate.py <experiment>
+
+Provides:
+- LoadEvalSet(path) -> list[dict]
+- KeyTerms(text) -> set[str]
+- AnswerRecall(expected, text) -> float
+- ChunksNeeded(expected, docs, threshold) -> int | None
+- CompareChunking(embedding_model, docs_path, eval_path, max_k) -> dict
+- CompareAdaptiveK(model_name, embedding_model, docs_path, eval_path) -> dict
+- CompareRouting(small_model, large_model, embedding_model, docs_path, eval_path, mode) -> dict
+"""
+
+import argparse
+import csv
+import re
+import time
+from typing import List, Dict, Optional, Set
+from langchain_core.documents import Document
+from langchain_ollama import OllamaEmbeddings
+from langchain_chroma import Chroma
+
+from database_bridge import LoadDocuments, SplitDocuments, InitializeDatabase, CombineDocuments
+from retrieval import RetrieveDocuments
+from config import DEFAULT_EMBEDDING_MODEL, DEFAULT_MODEL, DEFAULT_DOCS_PATH, EVAL_PATH, EVAL_RECALL_THRESHOLD
+from config import RETRIEVER_K, LIGHTRAG_K, ROUTER_LARGE_MODEL
+
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "is", "are", "be", "by", "for", "with",
+    "as", "at", "it", "its", "this", "that", "these", "then", "than", "from", "into", "which",
+    "each", "has", "have", "can", "will", "while", "only", "their", "there", "so", "we", "you"
+}
+
+
+def LoadEvalSet(path: str = EVAL_PATH) -> List[Dict[str, str]]:
+    """Load the evaluation questions & expected answers"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row for row in csv.DictReader(f) if row.get("input")]
+
+
+def KeyTerms(text: str) -> Set[str]:
+    """Lowercased content words & numbers used for answer matching"""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return {t for t in tokens if t not in STOPWORDS and (len(t) > 1 or t.isdigit())}
+
+
+def AnswerRecall(expected: str, text: str) -> float:
+    """Fraction of the expected answer's key terms present in text"""
+    expected_terms = KeyTerms(expected)
+    if not expected_terms:
+        return 0.0
+    return len(expected_terms & KeyTerms(text)) / len(expected_terms)
+
+
+def ChunksNeeded(expected: str, docs: List[Document], threshold: float = EVAL_RECALL_THRESHOLD) -> Optional[int]:
+    """Smallest number of top-ranked chunks whose combined text covers the expected answer"""
+    expected_terms = KeyTerms(expected)
+    if not expected_terms:
+        return None
+
+    covered: Set[str] = set()
+    for i, doc in enumerate(docs, 1):
+        covered |= KeyTerms(doc.page_content) & expected_terms
+        if len(covered) / len(expected_terms) >= threshold:
+            return i
+    return None
+
+
+def CompareChunking(embedding_model: str = DEFAULT_EMBEDDING_MODEL, docs_path: str = DEFAULT_DOCS_PATH,
+                    eval_path: str = EVAL_PATH, max_k: int = RETRIEVER_K) -> Dict[str, Dict[str, float]]:
+    """A/B the recursive character splitter against the layout-aware splitter"""
+    eval_set = LoadEvalSet(eval_path)
+    raw_docs = LoadDocuments(docs_path)
+    embeddings = OllamaEmbeddings(model=embedding_model)
+
+    report = {}
+    for name, layout in (("recursive", False), ("layout", True)):
+        chunks = SplitDocuments(raw_docs, layout=layout)
+        print(f"[{name}] {len(chunks)} chunks, embedding...")
+        db = Chroma.from_documents(documents=chunks, embedding=embeddings, collection_name=f"eval_{name}")
+
+        needed = []
+        for row in eval_set:
+            docs = db.similarity_search(row["input"], k=max_k)
+            count = ChunksNeeded(row["expected_output"], docs)
+            if count is not None:
+                needed.append(count)
+
+        report[name] = {
+            "chunks": len(chunks),
+            "answered": len(needed),
+            "questions": len(eval_set),
+            "avg_chunks_per_answer": sum(needed) / len(needed) if needed else float("nan"),
+            "avg_chunk_chars": sum(len(c.page_content) for c in chunks) / max(1, len(chunks))
+        }
+        db.delete_collection()
+
+    return report
+
+
+def _PromptTokens(response, prompt_text: str) -> int:
+    """Prompt tokens reported by Ollama, estimated from length when missing"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens") or len(prompt_text) // 4
+
+
+def CompareAdaptiveK(model_name: str = DEFAULT_MODEL, embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+                     docs_path: str = DEFAULT_DOCS_PATH, eval_path: str = EVAL_PATH) -> Dict[str, Dict[str, float]]:
+    """Fixed vs adaptive retrieval depth in both modes: chunks, prompt tokens, latency & accuracy"""
+    from llm import CreateLLM, BuildPrompt
+    from lightrag import LightRAG
+    from retrieval_cache import RETRIEVAL_CACHE
+
+    eval_set = LoadEvalSet(eval_path)
+    db = InitializeDatabase(embedding_model, docs_path)
+    llm = CreateLLM(model_name)
+    prompt = BuildPrompt()
+
+    report = {}
+    for mode, k in (("normal", RETRIEVER_K), ("lightrag", LIGHTRAG_K)):
+        for adaptive in (False, True):
+            # Each variant starts cold so cached retrievals don't flatter the second one
+            RETRIEVAL_CACHE.clear()
+            lightrag = LightRAG(llm, db, adaptive=adaptive)
+            chunks, tokens, latencies, correct = [], [], [], 0
+
+            for row in eval_set:
+                start = time.perf_counter()
+                if mode == "normal":
+                    docs_with_scores = RetrieveDocuments(db, row["input"], k, adaptive)
+                    messages = prompt.format_messages(
+                        context=CombineDocuments([d for d, _ in docs_with_scores]), question=row["input"], history=[]
+                    )
+                    prompt_text = "\n".join(m.content for m in messages)
+                    response = llm.invoke(messages)
+                else:
+                    docs_with_scores = lightrag.retrieve(row["input"])
+                    prompt_text = lightrag.build_prompt(row["input"], lightrag.rerank(docs_with_scores))
+                    response = llm.invoke(prompt_text)
+                latencies.append(time.perf_counter() - start)
+
+                chunks.append(len(docs_with_scores))
+                tokens.append(_PromptTokens(response, prompt_text))
+                correct += AnswerRecall(row["expected_output"], response.content) >= EVAL_RECALL_THRESHOLD
+
+            n = max(1, len(eval_set))
+            report[f"{mode}/{'adaptive' if adaptive else 'fixed'}"] = {
+                "avg_chunks": sum(chunks) / n,
+                "avg_prompt_tokens": sum(tokens) / n,
+                "avg_latency_s": sum(latencies) / n,
+                "accuracy": correct / n
+            }
+
+        fixed, adaptive_row = report[f"{mode}/fixed"], report[f"{mode}/adaptive"]
+        adaptive_row["tokens_saved"] = fixed["avg_prompt_tokens"] - adaptive_row["avg_prompt_tokens"]
+        adaptive_row["latency_saved_s"] = fixed["avg_latency_s"] - adaptive_row["avg_latency_s"]
+
+    return report
+
+
+def CompareRouting(small_model: str = DEFAULT_MODEL, large_model: str = ROUTER_LARGE_MODEL,
+                   embedding_model: str = DEFAULT_EMBEDDING_MODEL, docs_path: str = DEFAULT_DOCS_PATH,
+                   eval_path: str = EVAL_PATH, mode: str = "rag") -> Dict[str, Dict[str, float]]:
+    """
+    Small model only, large model only & the router between them on the same retrieved chunks,
+    in LightRAG ("rag", with escalation) or Normal mode ("normal", the chain's prompt & RoutedModel).
+    Routed questions are also broken down by the route they took.
+    """
+    from langchain_core.output_parsers import StrOutputParser
+    from llm import CreateLLM, BuildPrompt, RoutedModel
+    from lightrag import LightRAG
+    from router import ModelRouter
+
+    eval_set = LoadEvalSet(eval_path)
+    db = InitializeDatabase(embedding_model, docs_path)
+    small, large = CreateLLM(small_model), CreateLLM(large_model)
+    retrieved = [RetrieveDocuments(db, row["input"], LIGHTRAG_K if mode == "rag" else RETRIEVER_K) for row in eval_set]
+
+    def answer(llm, question: str, docs_with_scores) -> Dict[str, Optional[str]]:
+        """Answer & route the way the chosen mode would"""
+        if mode == "rag":
+            return LightRAG(llm, db).generate(question, docs_with_scores=docs_with_scores)
+        chain = RoutedModel(llm, BuildPrompt()) | StrOutputParser()
+        text = chain.invoke({"question": question, "history": [], "docs_with_scores": docs_with_scores,
+                             "context": CombineDocuments([doc for doc, _ in docs_with_scores])})
+        route = llm.route(question, docs_with_scores)[0] if isinstance(llm, ModelRouter) else None
+        return {"answer": text, "route": route}
+
+    def row_stats(latencies: List[float], correct: List[bool], total: int) -> Dict[str, float]:
+        n = max(1, len(latencies))
+        return {
+            "questions": len(latencies),
+            "share": len(latencies) / max(1, total),
+            "avg_latency_s": sum(latencies) / n,
+            "accuracy": sum(correct) / n
+        }
+
+    report = {}
+    for name, llm in (("small", small), ("large", large), ("routed", ModelRouter(small, large))):
+        by_route: Dict[str, tuple] = {}
+        latencies, correct = [], []
+        for row, docs_with_scores in zip(eval_set, retrieved):
+            start = time.perf_counter()
+            result = answer(llm, row["input"], docs_with_scores)
+            latency = time.perf_counter() - start
+            ok = AnswerRecall(row["expected_output"], result["answer"]) >= EVAL_RECALL_THRESHOLD
+            latencies.append(latency)
+            correct.append(ok)
+            route_latencies, route_correct = by_route.setdefault(result.get("route") or name, ([], []))
+            route_latencies.append(latency)
+            route_correct.append(ok)
+
+        report[name] = row_stats(latencies, correct, len(eval_set))
+        if name == "routed":
+            for route, (route_latencies, route_correct) in sorted(by_route.items()):
+                report[f"routed/{route}"] = row_stats(route_latencies, route_correct, len(eval_set))
+
+    report["routed"]["latency_saved_s"] = report["large"]["avg_latency_s"] - report["routed"]["avg_latency_s"]
+    report["routed"]["accuracy_lost"] = report["large"]["accuracy"] - report["routed"]["accuracy"]
+    return report
+
+
+def PrintReport(title: str, report: Dict[str, Dict[str, float]]):
+    """Print one row per variant of an experiment"""
+    print("\n" + "="*60)
+    print(title)
+    print("="*60)
+    for name, row in report.items():
+        stats = " | ".join(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}"
+                           for key, value in row.items())
+        print(f"{name:>12}  {stats}")
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="ECEN 214 Lab Assistant - evaluation harness")
+    parser.add_argument("experiment", choices=["chunking", "adaptive", "routing"], help="Experiment to run")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL, help="LLM model name")
+    parser.add_argument("--large-model", default=ROUTER_LARGE_MODEL, help="Large model for the routing experiment")
+    parser.add_argument("--mode", choices=["rag", "normal"], default="rag", help="Query mode for the routing experiment")
+    parser.add_argument("-e", "--embedding", default=DEFAULT_EMBEDDING_MODEL, help="Embedding model name")
+    parser.add_argument("-p", "--path", default=DEFAULT_DOCS_PATH, help="Documents directory")
+    parser.add_argument("--eval", default=EVAL_PATH, help="Evaluation CSV (input, expected_output)")
+    parser.add_argument("-k", type=int, default=RETRIEVER_K, help="Maximum chunks retrieved per question")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.experiment == "chunking":
+        PrintReport("Chunks needed per correct answer", CompareChunking(args.embedding, args.path, args.eval, args.k))
+    elif args.experiment == "adaptive":
+        PrintReport("Fixed vs adaptive retrieval depth", CompareAdaptiveK(args.model, args.embedding, args.path, args.eval))
+    elif args.experiment == "routing":
+        PrintReport(f"Small vs large vs routed model ({args.mode} mode)",
+                    CompareRouting(args.model, args.large_model, args.embedding, args.path, args.eval, args.mode))
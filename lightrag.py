@@ -10,29 +10,38 @@ Enhancing retrieval via scoring, simple reranking based on relevance scoring, Ev
 generation, & overlap scoring for transparency.
 """
 
-from typing import List, Dict, Any, Tuple
+import time
+from typing import List, Dict, Any, Tuple, Optional
 from langchain_core.documents import Document
-from config import LIGHTRAG_K, LIGHTRAG_PROMPT
+from coalesce import SingleFlight, NormalizeQuery, QUERY_COALESCER
+from retrieval import RetrieveDocuments
+from chunk_store import ChunkWords
+from router import ModelRouter
+from config import LIGHTRAG_K, LIGHTRAG_PROMPT, ADAPTIVE_K
 
 
 class LightRAG:
     """
     Lightweight RAG wrapper enhancing standard RAG with:
-    - retrieve top-K documents via db retriever
+    - retrieve top-K documents via db retriever, cut down adaptively by score distribution
     - simple rerank (heuristic on score + doc length)
     - assemble evidence-first prompt and call llm
     - compute cheap overlap evidence scores and return structured output
+    - share one run between identical concurrent queries (single-flight coalescing)
+    - with a ModelRouter as llm, answer with the small or large model & escalate poorly grounded answers
     """
 
-    def __init__(self, llm, db, top_k: int = LIGHTRAG_K):
+    def __init__(self, llm, db, top_k: int = LIGHTRAG_K, coalescer: Optional[SingleFlight] = None,
+                 adaptive: bool = ADAPTIVE_K):
         self.llm = llm
         self.db = db
         self.top_k = top_k
+        self.adaptive = adaptive
+        self.coalescer = coalescer or QUERY_COALESCER
     
     def retrieve(self, query: str) -> List[Tuple[Document, float]]:
         """Retrieve documents with relevance scores"""
-        results = self.db.similarity_search_with_relevance_scores(query, k=self.top_k)
-        return results
+        return RetrieveDocuments(self.db, query, self.top_k, self.adaptive)
     
     def rerank(self, docs_with_scores: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
         """Rerank by adjusting scores based on document length"""
@@ -69,7 +78,7 @@ class LightRAG:
         
         evidence_list = []
         for i, (doc, score) in enumerate(docs_with_scores, 1):
-            doc_words = set(doc.page_content.lower().split())
+            doc_words = ChunkWords(doc)
             overlap = len(answer_words & doc_words)
             total = len(answer_words | doc_words)
             overlap_score = overlap / total if total > 0 else 0
@@ -85,16 +94,30 @@ class LightRAG:
         evidence_list.sort(key=lambda x: x["overlap_score"], reverse=True)
         return evidence_list
     
-    def generate(self, query: str) -> Dict[str, Any]:
-        """Generate answer with enhanced retrieval"""
-        print("\nRetrieving relevant documents...")
-        docs_with_scores = self.retrieve(query)
+    def _answer(self, llm, prompt: str) -> str:
+        response = llm.invoke(prompt)
+        return response.content if hasattr(response, "content") else str(response)
+    
+    def generate(self, query: str, docs_with_scores: Optional[List[Tuple[Document, float]]] = None) -> Dict[str, Any]:
+        """Generate answer with enhanced retrieval, skips retrieval when docs_with_scores are given"""
+        if docs_with_scores is not None:
+            return self._generate(query, docs_with_scores)
+        
+        # Concurrent identical questions wait for the first one instead of re-running it
+        key = ("lightrag", getattr(self.llm, "model", ""), self.top_k, self.adaptive, NormalizeQuery(query))
+        return dict(self.coalescer.do(key, lambda: self._generate(query)))
+    
+    def _generate(self, query: str, docs_with_scores: Optional[List[Tuple[Document, float]]] = None) -> Dict[str, Any]:
+        if docs_with_scores is None:
+            print("\nRetrieving relevant documents...")
+            docs_with_scores = self.retrieve(query)
         
         if not docs_with_scores:
             return {
                 "answer": "No relevant information found in the documents.",
                 "evidence": [],
-                "sources": []
+                "sources": [],
+                "route": None
             }
         
         print(f"Found {len(docs_with_scores)} documents")
@@ -103,12 +126,27 @@ class LightRAG:
         reranked = self.rerank(docs_with_scores)
         prompt = self.build_prompt(query, reranked)
         
-        response = self.llm.invoke(prompt)
-        answer = response.content if hasattr(response, "content") else str(response)
+        router = self.llm if isinstance(self.llm, ModelRouter) else None
+        route, llm = None, self.llm
+        if router:
+            route, reasons = router.route(query, docs_with_scores)
+            llm = router.models[route]
+            print(f"Answering with the {route} model" + (f" ({', '.join(reasons)})" if reasons else ""))
+        
+        start = time.perf_counter()
+        answer = self._answer(llm, prompt)
         
         print("Computing evidence contributions...")
         evidence = self.compute_overlap(answer, reranked)
         
+        if route == "small" and router.should_escalate(evidence):
+            print("Answer poorly grounded in the evidence, escalating to the large model...")
+            route = "escalated"
+            answer = self._answer(router.models["large"], prompt)
+            evidence = self.compute_overlap(answer, reranked)
+        if router:
+            router.record(route, time.perf_counter() - start)
+        
         sources = [
             f"{doc.metadata.get('source', 'Unknown')} (Page {doc.metadata.get('page', '?')})"
             for doc, _ in reranked
@@ -117,5 +155,6 @@ class LightRAG:
         return {
             "answer": answer,
             "evidence": evidence,
-            "sources": sources
+            "sources": sources,
+            "route": route
         }
\ No newline at end of file
@@ -3,18 +3,27 @@ File to handle the Large Language Model being ran on-device.
 
 Provides:
 - GetSession(session_id) -> BaseChatMessageHistory
+- CreateLLM(model_name) -> ChatOllama
+- BuildPrompt(layout) -> ChatPromptTemplate
+- RoutedModel(llm, prompt) -> Runnable
 - BuildChain(llm, db, session_id) -> None
 - ClearSession(session_id) -> None
 """
-from typing import Dict
+import time
+from typing import Dict, Any, Iterator
 from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnablePassthrough, RunnableGenerator
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
+from langchain_ollama import ChatOllama
 
 from database_bridge import CombineDocuments
-from config import ANSWER_PROMPT, RETRIEVER_K
+from coalesce import CoalesceChain
+from retrieval import RetrieveDocuments
+from router import ModelRouter
+from config import ANSWER_PROMPT, ANSWER_SYSTEM_PROMPT, ANSWER_CONTEXT_PROMPT, PROMPT_LAYOUT, RETRIEVER_K
+from config import DEFAULT_MODEL, LLM_TEMPERATURE, LLM_TOP_P, LLM_MAX_TOKENS, LLM_NUM_CTX, OLLAMA_KEEP_ALIVE
 
 # Store for conversation history
 sessions: Dict[str, InMemoryChatMessageHistory] = {}
@@ -26,32 +35,84 @@ def GetSession(session_id: str) -> BaseChatMessageHistory:
     return sessions[session_id]
 
 
-def BuildChain(llm, db, session_id: str = "default"):
-    """Build conversational RAG chain"""
-    retriever = db.as_retriever(search_kwargs={"k": RETRIEVER_K})
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", ANSWER_PROMPT),
+def CreateLLM(model_name: str = DEFAULT_MODEL) -> ChatOllama:
+    """
+    Chat model with the project's generation settings.
+    Options & keep_alive stay constant so Ollama keeps the model (& its KV cache) warm between turns.
+    """
+    return ChatOllama(
+        model=model_name,
+        temperature=LLM_TEMPERATURE,
+        top_p=LLM_TOP_P,
+        num_predict=LLM_MAX_TOKENS,
+        num_ctx=LLM_NUM_CTX,
+        keep_alive=OLLAMA_KEEP_ALIVE
+    )
+
+
+def BuildPrompt(layout: str = PROMPT_LAYOUT) -> ChatPromptTemplate:
+    """
+    Normal mode chat prompt.
+    "prefix_cache" puts static instructions & history first & the retrieved context last, so
+    every turn shares its prefix with the previous one. "legacy" embeds context in the system prompt.
+    """
+    if layout == "legacy":
+        return ChatPromptTemplate.from_messages([
+            ("system", ANSWER_PROMPT),
+            MessagesPlaceholder(variable_name="history"),
+            ("human", "{question}")
+        ])
+
+    return ChatPromptTemplate.from_messages([
+        ("system", ANSWER_SYSTEM_PROMPT),
         MessagesPlaceholder(variable_name="history"),
-        ("human", "{question}")
+        ("human", ANSWER_CONTEXT_PROMPT)
     ])
+
+
+def RoutedModel(llm, prompt: ChatPromptTemplate):
+    """
+    prompt | llm, except that a ModelRouter picks the model per question & records the route
+    with its generation latency. Answers are streamed as they are generated, so unlike LightRAG
+    there is no escalation after the fact.
+    Expects "question" & optionally "docs_with_scores" in the chain input.
+    """
+    if not isinstance(llm, ModelRouter):
+        return prompt | llm
+
+    def routed(inputs: Iterator[Dict[str, Any]]) -> Iterator[Any]:
+        payload: Dict[str, Any] = {}
+        for chunk in inputs:
+            payload.update(chunk)
+        route, _ = llm.route(payload["question"], payload.get("docs_with_scores"))
+        start = time.perf_counter()
+        try:
+            yield from (prompt | llm.models[route]).stream(payload)
+        finally:
+            llm.record(route, time.perf_counter() - start)
+
+    return RunnableGenerator(routed)
+
+
+def BuildChain(llm, db, session_id: str = "default"):
+    """Build conversational RAG chain, llm may be a chat model or a ModelRouter"""
+    prompt = BuildPrompt()
     
-    def get_context(question):
-        docs = retriever.invoke(question)
-        return CombineDocuments(docs)
-    
+    # Scores are kept next to the context so the router can use them, the output carries
+    # the same documents as "docs_with_scores" so the sources shown are the ones answered from
     chain = (
-        RunnablePassthrough.assign(context=lambda x: get_context(x["question"]))
-        | prompt
-        | llm
-        | StrOutputParser()
+        RunnablePassthrough.assign(docs_with_scores=lambda x: RetrieveDocuments(db, x["question"], RETRIEVER_K))
+        | RunnablePassthrough.assign(context=lambda x: CombineDocuments([doc for doc, _ in x["docs_with_scores"]]))
+        | RunnablePassthrough.assign(answer=RoutedModel(llm, prompt) | StrOutputParser())
     )
     
+    # Identical concurrent questions (same history) share one retrieval & generation
     chain_with_history = RunnableWithMessageHistory(
-        chain,
+        CoalesceChain(chain, name=f"chain:{getattr(llm, 'model', '')}"),
         GetSession,
         input_messages_key="question",
-        history_messages_key="history"
+        history_messages_key="history",
+        output_messages_key="answer"
     )
     
     def chat(user_input: str):
@@ -61,10 +122,10 @@ def BuildChain(llm, db, session_id: str = "default"):
         )
         
         print("\n" + "="*60)
-        print(result)
+        print(result["answer"])
         print("="*60)
         
-        docs = retriever.invoke(user_input)
+        docs = [doc for doc, _ in result["docs_with_scores"]]
         print("\nSources:")
         for i, doc in enumerate(docs[:3], 1):
             source = doc.metadata.get("source", "Unknown")
@@ -0,0 +1,262 @@
+"""
+Background memory governor, replaces the periodic ClearCudaCache calls on the request path.
+A daemon thread samples process RSS, system available memory (shared with the GPU on the
+Jetson) & torch device memory, then only runs cleanup or Ollama model unloads when a
+threshold is crossed. Every action is logged with what it freed.
+
+The reader & actions are injectable so the governor can be exercised on CPU-only Linux
+with simulated readings, call check() directly instead of start().
+
+Provides:
+- ReadRSS() -> float (MB)
+- ReadMemory() -> dict
+- MemoryGovernor Class
+- StartGovernor(keep) -> MemoryGovernor
+"""
+
+import gc
+import sys
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Any
+
+from config import (MEMORY_CHECK_INTERVAL, MEMORY_RSS_SOFT_MB, MEMORY_AVAILABLE_MIN_MB, MEMORY_DEVICE_SOFT_MB,
+                    MEMORY_ACTION_COOLDOWN, MEMORY_MAX_COOLDOWN, MEMORY_MIN_FREED_MB, MEMORY_UNLOAD_MODELS)
+
+#The record field that shows whether an action helped
+_FREED_FIELD = {"collect": "rss_freed_mb", "release_device": "device_freed_mb", "unload_models": "available_gained_mb"}
+
+
+def _ProcValue(path: str, field: str) -> Optional[float]:
+    """Read a kB field from a /proc file as MB"""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def ReadRSS() -> float:
+    """Current resident set size of this process in MB"""
+    rss = _ProcValue("/proc/self/status", "VmRSS")
+    if rss is not None:
+        return rss
+    import resource
+    #Peak instead of current on platforms without /proc
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ReadMemory() -> Dict[str, float]:
+    """Sample process, system & device memory in MB, missing readings are 0"""
+    reading = {
+        "rss_mb": ReadRSS(),
+        "available_mb": _ProcValue("/proc/meminfo", "MemAvailable") or 0.0,
+        "device_mb": 0.0
+    }
+    #Only look at CUDA if torch is already loaded, importing it here would cost more than it saves
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        reading["device_mb"] = torch.cuda.memory_reserved() / (1024 * 1024)
+    return reading
+
+
+def _Collect():
+    gc.collect()
+
+
+def _ReleaseDevice():
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def _SameModel(a: str, b: str) -> bool:
+    """Model names match, "name" being short for "name:latest" """
+    return (a if ":" in a else f"{a}:latest") == (b if ":" in b else f"{b}:latest")
+
+
+def _UnloadModels(models: Optional[List[str]], keep: List[str]) -> List[str]:
+    """
+    Ask Ollama to unload loaded models, only those in models unless it is None, never those in
+    keep. The next request for an unloaded model reloads it. Returns the models unloaded.
+    """
+    import ollama
+    loaded = [m.get("model") or m.get("name") for m in ollama.ps().get("models", [])]
+    unload = [name for name in loaded if name
+              and (models is None or any(_SameModel(name, model) for model in models))
+              and not any(_SameModel(name, model) for model in keep)]
+    for name in unload:
+        ollama.generate(model=name, prompt="", keep_alive=0)
+    return unload
+
+
+class MemoryGovernor:
+    """
+    Samples memory every interval seconds on a daemon thread & runs actions when needed:
+    - collect: gc.collect() when process RSS passes rss_soft_mb
+    - release_device: torch.cuda.empty_cache() when reserved device memory passes device_soft_mb
+    - unload_models: unload Ollama models the app isn't keeping (see keep) when available memory drops under available_min_mb
+    Each action has a cooldown so a reading stuck over a threshold does not loop cleanups. The cooldown
+    doubles up to max_cooldown every time the action frees nothing, e.g. RSS that is live data rather
+    than garbage, & resets once the action helps again or the reading drops back under its threshold.
+    """
+
+    def __init__(self, reader: Callable[[], Dict[str, float]] = ReadMemory,
+                 actions: Optional[Dict[str, Callable[[], Any]]] = None,
+                 interval: float = MEMORY_CHECK_INTERVAL, rss_soft_mb: float = MEMORY_RSS_SOFT_MB,
+                 available_min_mb: float = MEMORY_AVAILABLE_MIN_MB, device_soft_mb: float = MEMORY_DEVICE_SOFT_MB,
+                 cooldown: float = MEMORY_ACTION_COOLDOWN, unload_models: Optional[List[str]] = MEMORY_UNLOAD_MODELS,
+                 clock: Callable[[], float] = time.monotonic, log: Callable[[str], Any] = print,
+                 max_cooldown: float = MEMORY_MAX_COOLDOWN, min_freed_mb: float = MEMORY_MIN_FREED_MB):
+        self.reader = reader
+        self.unload_models = None if unload_models is None else list(unload_models)
+        self.keep_models: List[str] = []
+        self.actions = actions or {
+            "collect": _Collect,
+            "release_device": _ReleaseDevice,
+            "unload_models": lambda: _UnloadModels(self.unload_models, self.keep_models)
+        }
+        self.interval = interval
+        self.rss_soft_mb = rss_soft_mb
+        self.available_min_mb = available_min_mb
+        self.device_soft_mb = device_soft_mb
+        self.cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.min_freed_mb = min_freed_mb
+        self.clock = clock
+        self.log = log
+
+        self.last_run: Dict[str, float] = {}
+        self.cooldowns: Dict[str, float] = {}  # backed-off cooldown per action, base cooldown when missing
+        self.history = deque(maxlen=100)
+        self.cleanup_requested = False
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def due_actions(self, reading: Dict[str, float], forced: bool = False) -> List[str]:
+        """Actions called for by a reading, before cooldowns"""
+        due = []
+        if forced or reading.get("rss_mb", 0) > self.rss_soft_mb:
+            due.append("collect")
+        if forced or reading.get("device_mb", 0) > self.device_soft_mb:
+            due.append("release_device")
+        available = reading.get("available_mb", 0)
+        if available and available < self.available_min_mb:
+            due += ["collect", "release_device", "unload_models"]
+        return list(dict.fromkeys(due))
+
+    def check(self) -> List[Dict[str, Any]]:
+        """Take one reading & run the actions it calls for, returns what was done"""
+        reading = self.reader()
+        forced = self.cleanup_requested
+        self.cleanup_requested = False
+
+        records = []
+        due = self.due_actions(reading, forced)
+        #Back to the base cooldown once the pressure behind an action is gone
+        for name in [name for name in self.cooldowns if name not in due]:
+            del self.cooldowns[name]
+
+        for name in due:
+            now = self.clock()
+            #A requested cleanup skips the cooldown, threshold triggered actions respect it
+            if not forced and now - self.last_run.get(name, float("-inf")) < self.cooldowns.get(name, self.cooldown):
+                continue
+            #Stop escalating once an earlier action already brought memory back under the thresholds
+            action = self.actions.get(name)
+            if action is None or name not in self.due_actions(reading, forced):
+                continue
+
+            try:
+                result = action()
+                error = None
+            except Exception as e:
+                result, error = None, str(e)
+            self.last_run[name] = now
+
+            after = self.reader()
+            record = {
+                "action": name,
+                "time": time.time(),
+                "rss_freed_mb": reading.get("rss_mb", 0) - after.get("rss_mb", 0),
+                "device_freed_mb": reading.get("device_mb", 0) - after.get("device_mb", 0),
+                "available_gained_mb": after.get("available_mb", 0) - reading.get("available_mb", 0),
+                "models": result if name == "unload_models" else None,
+                "error": error
+            }
+            self.history.append(record)
+            records.append(record)
+            self.log(
+                f"Memory governor: {name} freed {record['rss_freed_mb']:.0f} MB RSS, "
+                f"{record['device_freed_mb']:.0f} MB device, available +{record['available_gained_mb']:.0f} MB"
+                + (f" (unloaded: {', '.join(result) or 'none'})" if record["models"] is not None else "")
+                + (f" (error: {error})" if error else "")
+            )
+            self._back_off(name, record)
+            reading = after
+
+        return records
+
+    def _back_off(self, name: str, record: Dict[str, Any]):
+        """Double an action's cooldown while it frees nothing, reset it once it helps"""
+        if record[_FREED_FIELD.get(name, "rss_freed_mb")] >= self.min_freed_mb:
+            self.cooldowns.pop(name, None)
+            return
+        cooldown = min(self.cooldowns.get(name, self.cooldown) * 2, self.max_cooldown)
+        if cooldown != self.cooldowns.get(name):
+            self.log(f"Memory governor: {name} freed nothing, next try in {cooldown:.0f}s")
+        self.cooldowns[name] = cooldown
+
+    def keep(self, *models: str):
+        """Models the app is serving with, never unloaded under pressure"""
+        self.keep_models = [model for model in models if model]
+
+    def request_cleanup(self):
+        """Ask for a cleanup on the governor thread, returns immediately"""
+        self.cleanup_requested = True
+        self.wake.set()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            if self.stopping.is_set():
+                break
+            try:
+                self.check()
+            except Exception as e:
+                self.log(f"Memory governor: check failed: {e}")
+
+    def start(self) -> "MemoryGovernor":
+        """Start sampling on a daemon thread"""
+        if self.thread is None or not self.thread.is_alive():
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run, name="memory-governor", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 1)
+
+
+_governor: Optional[MemoryGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def StartGovernor(keep: Optional[List[str]] = None) -> MemoryGovernor:
+    """Process-wide governor, started on first call, keep replaces the models it never unloads"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = MemoryGovernor().start()
+        if keep is not None:
+            _governor.keep(*keep)
+        return _governor
@@ -5,10 +5,17 @@ Provides:
 - CheckModelAvailability(modelName) -> bool
 - GetListOfModels() -> list[str]
 - PullModel(modelName) -> bool
+- ProvisionModels(manifest, max_workers, retries, host, client) -> dict
+- ModelName(entry) -> str
 """
+import time
+import threading
 import ollama
 from tqdm import tqdm
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from config import PROVISION_WORKERS, PROVISION_RETRIES, PROVISION_BACKOFF, PROVISION_TIMEOUT
 
 #Helper Functions
 def CheckLocalAvailability(modelName: str) -> bool:
@@ -27,21 +34,8 @@ def CheckModelAvailability(modelName: str) -> bool:
     Return True when the model becomes available locally (with or without pulling)
     Return False if the model couldnt be found nor pulled.
     """
+    return ProvisionModels([modelName])[ModelName(modelName)]["ok"]
 
-    if CheckLocalAvailability(modelName):
-        return True
-    
-    try:
-        pulled=PullModel(modelName)
-    except Exception:
-        pulled = False
-    
-    if pulled and CheckLocalAvailability(modelName):
-        return True
-    
-    print(f"Failed to get model {modelName}")
-    return False
-    
 
 def GetListOfModels() -> List[str]:
     """
@@ -67,43 +61,170 @@ def GetListOfModels() -> List[str]:
 def PullModel(modelName: str) -> bool:
     """
     Attempt to pull modelName from Ollama hub.
-    Stream progress and returns True or False depending on success.
+    Retries with resume & reports progress, returns True or False depending on success.
     """
-    try:
-        currDigest = ""
-        bars = {}
-
-        for progress in ollama.pull(modelName, stream=True):
-            digest = progress.get("digest", "")
-            
-            if digest != currDigest and currDigest in bars:
-                bars[currDigest].close()
-            
-            if not digest:
-                status = progress.get("status")
-                if status:
-                    print(status)
-                continue
-            
-            if digest not in bars and (total := progress.get("total")):
-                bars[digest] = tqdm(
-                    total=total, 
-                    desc=f"Pulling {digest[7:19]}", 
-                    unit="B", 
-                    unit_scale=True
-                )
-            
-            if completed := progress.get("completed"):
-                bars[digest].update(completed - bars[digest].n)
-            
-            currDigest = digest
-
-        for bar in bars.values():
-            bar.close()
-
-        print(f"Successfully pulled {modelName}")
+    return ProvisionModels([modelName], check=False)[ModelName(modelName)]["ok"]
+
+
+class _Progress:
+    """
+    One progress bar for every layer of every model being pulled.
+    Layers are keyed by digest because Ollama shares blobs between models, so a layer two
+    models have in common is only counted once. Bytes a layer already had when it was first
+    reported (resumed or present) count toward the bar but not toward throughput.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals: Dict[str, int] = {}
+        self.completed: Dict[str, int] = {}
+        self.transferred = 0
+        self.bar = None
+
+    def update(self, digest: str, total: Optional[int], completed: Optional[int]):
+        if not digest or not total:
+            return
+        completed = completed or 0
+        with self.lock:
+            if self.bar is None:
+                self.bar = tqdm(total=0, desc="Provisioning models", unit="B", unit_scale=True)
+            if digest not in self.totals:
+                self.totals[digest] = total
+                self.completed[digest] = completed
+                self.bar.total += total
+                self.bar.update(completed)
+                return
+            #A restarted layer reports less than before, only progress past the old mark is new
+            delta = completed - self.completed[digest]
+            if delta > 0:
+                self.completed[digest] = completed
+                self.transferred += delta
+                self.bar.update(delta)
+
+    def close(self):
+        with self.lock:
+            if self.bar is not None:
+                self.bar.close()
+
+
+def _ManifestEntry(entry: Union[str, Dict[str, str]]) -> Tuple[str, Optional[str]]:
+    """(name, expected manifest digest) from "name", "name@sha256:..." or {"name", "digest"}"""
+    if isinstance(entry, dict):
+        return entry["name"], entry.get("digest")
+    name, _, digest = entry.partition("@")
+    return name, digest or None
+
+
+def ModelName(entry: Union[str, Dict[str, str]]) -> str:
+    """Model name of a manifest entry without its pinned digest, the key ProvisionModels reports it under"""
+    return _ManifestEntry(entry)[0]
+
+
+def _SameModel(a: str, b: str) -> bool:
+    """Model names match, "name" being short for "name:latest" """
+    return (a if ":" in a else f"{a}:latest") == (b if ":" in b else f"{b}:latest")
+
+
+def _LocalDigest(client, name: str) -> Optional[str]:
+    """Manifest digest of a local model, None when it isn't installed"""
+    for m in client.list().get("models", []):
+        if _SameModel(m.get("model") or m.get("name") or "", name):
+            return m.get("digest")
+    return None
+
+
+def _DigestMatches(local: Optional[str], expected: Optional[str]) -> bool:
+    """Compare manifest digests, the expected one may be given with or without "sha256:" or shortened"""
+    if not expected:
         return True
-        
-    except Exception as e:
-        print(f"Failed to pull {modelName}: {e}")
+    if not local:
         return False
+    local, expected = local.split(":")[-1], expected.split(":")[-1]
+    return local.startswith(expected) or expected.startswith(local)
+
+
+def _Verify(client, name: str, expected: Optional[str]) -> Optional[str]:
+    """None if the model is usable & matches the expected digest, otherwise why not"""
+    try:
+        client.show(model=name)
+    except Exception as e:
+        return f"not available: {e}"
+    if expected:
+        local = _LocalDigest(client, name)
+        if not _DigestMatches(local, expected):
+            return f"digest mismatch: expected {expected}, found {local}"
+    return None
+
+
+def _Pull(client, name: str, expected: Optional[str], progress: _Progress,
+          retries: int, backoff: float) -> Dict[str, Any]:
+    """
+    Pull one model, retrying with exponential backoff.
+    Ollama keeps partially downloaded layers & checks each layer's sha256, so a retry
+    resumes the transfer instead of starting over. A manifest digest that doesn't match the
+    pinned one fails right away, pulling the same tag again would fetch the same manifest.
+    """
+    result = {"ok": False, "pulled": True, "attempts": 0, "error": None}
+    for attempt in range(max(1, retries)):
+        result["attempts"] = attempt + 1
+        try:
+            for event in client.pull(name, stream=True):
+                progress.update(event.get("digest", ""), event.get("total"), event.get("completed"))
+            result["error"] = _Verify(client, name, expected)
+            if result["error"] is None:
+                result["ok"] = True
+                return result
+            if result["error"].startswith("digest mismatch"):
+                return result
+        except Exception as e:
+            result["error"] = str(e)
+
+        if attempt + 1 < retries:
+            wait = backoff * 2 ** attempt
+            tqdm.write(f"{name}: {result['error']}, retrying in {wait:.0f}s ({attempt + 2}/{retries})")
+            time.sleep(wait)
+    return result
+
+
+def ProvisionModels(manifest: List[Union[str, Dict[str, str]]], max_workers: int = PROVISION_WORKERS,
+                    retries: int = PROVISION_RETRIES, host: Optional[str] = None, client=None,
+                    check: bool = True, backoff: float = PROVISION_BACKOFF) -> Dict[str, Dict[str, Any]]:
+    """
+    Make every model in manifest available, checking & pulling up to max_workers at a time.
+    Entries are model names, optionally pinned as "name@sha256:<digest>" or {"name", "digest"}.
+    host (or client) points at another Ollama server, e.g. a local mirror or a fake registry.
+    check=False pulls even models that are already present.
+    Returns {name: {ok, pulled, attempts, error, seconds}} & prints one aggregated report.
+    """
+    #The timeout applies between streamed progress updates, so only a stalled transfer hits it
+    client = client or ollama.Client(host=host, timeout=PROVISION_TIMEOUT)
+    entries = list(dict.fromkeys(_ManifestEntry(entry) for entry in manifest))
+    progress = _Progress()
+    start = time.perf_counter()
+
+    def provision(entry: Tuple[str, Optional[str]]) -> Dict[str, Any]:
+        name, expected = entry
+        began = time.perf_counter()
+        if check and _Verify(client, name, expected) is None:
+            result = {"ok": True, "pulled": False, "attempts": 0, "error": None}
+        else:
+            result = _Pull(client, name, expected, progress, retries, backoff)
+        result["seconds"] = time.perf_counter() - began
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="provision") as pool:
+        results = dict(zip((name for name, _ in entries), pool.map(provision, entries)))
+    progress.close()
+
+    elapsed = time.perf_counter() - start
+    pulled = [name for name, r in results.items() if r["pulled"] and r["ok"]]
+    failed = [name for name, r in results.items() if not r["ok"]]
+    present = len(results) - len(pulled) - len(failed)
+    print(f"Models: {present} present, {len(pulled)} pulled, {len(failed)} failed in {elapsed:.1f}s")
+    if progress.transferred:
+        print(f"Downloaded {progress.transferred / 1e6:.1f} MB at {progress.transferred / 1e6 / elapsed:.1f} MB/s")
+    for name in pulled:
+        print(f"  {name}: pulled in {results[name]['seconds']:.1f}s, attempt {results[name]['attempts']}")
+    for name in failed:
+        print(f"  Failed to get model {name}: {results[name]['error']}")
+    return results
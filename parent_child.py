@@ -0,0 +1,211 @@
+"""
+Parent/child (small-to-big) retrieval index.
+Small child chunks are embedded for search, each one points at a larger parent section
+stored once in a compressed SQLite docstore next to the Chroma database. At query time the
+children are searched & their parents returned instead, deduplicated & ranked by best child.
+
+Provides:
+- ParentDocstore Class
+- ParentChildStore Class
+- BuildParentChildDocuments(raw_docs) -> (List[Document], List[Document])
+"""
+
+import os
+import json
+import zlib
+import bisect
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import List, Tuple, Dict, Any, Optional
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from vector_store import WrappedVectorStore
+from config import (PARENT_CHUNK_SIZE, CHILD_CHUNK_SIZE, CHILD_CHUNK_OVERLAP, CHILD_MIN_CHARS,
+                    PARENT_MAX_RESULTS, PARENT_DOCSTORE_PATH)
+
+
+class ParentDocstore:
+    """Compressed parent sections keyed by parent_id, shared between processes via SQLite"""
+
+    def __init__(self, path: str = PARENT_DOCSTORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS parents (id TEXT PRIMARY KEY, content BLOB, metadata TEXT)"
+        )
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
+
+    def replace(self, parents: List[Document]):
+        """Replace the stored parents with a freshly built set"""
+        rows = [
+            (doc.metadata["parent_id"], zlib.compress(doc.page_content.encode("utf-8")), json.dumps(doc.metadata))
+            for doc in parents
+        ]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM parents")
+            self.conn.executemany("INSERT OR REPLACE INTO parents VALUES (?, ?, ?)", rows)
+
+    def get_many(self, parent_ids: List[str]) -> Dict[str, Document]:
+        """Fetch parents by id, missing ids are left out"""
+        if not parent_ids:
+            return {}
+        marks = ",".join("?" * len(parent_ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT id, content, metadata FROM parents WHERE id IN ({marks})", parent_ids
+            ).fetchall()
+        return {
+            pid: Document(page_content=zlib.decompress(content).decode("utf-8"), metadata=json.loads(metadata))
+            for pid, content, metadata in rows
+        }
+
+
+def _ParentId(doc: Document) -> str:
+    """Stable id for a parent section"""
+    key = f"{doc.metadata.get('source', '')}|{doc.metadata.get('page', '')}|{doc.page_content}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _PageParents(pages: List[Document], splitter: RecursiveCharacterTextSplitter) -> List[Tuple[Document, List[int], list]]:
+    """
+    Pack consecutive pages of each PDF into parents of up to PARENT_CHUNK_SIZE characters.
+    Slides are mostly shorter than a chunk, so page-bound parents would be barely bigger than
+    their children. Returns (parent, start offset of each page, each page's metadata) so
+    children can still be cited by the page they came from.
+    """
+    files: Dict[str, List[Document]] = {}
+    for page in pages:
+        files.setdefault(page.metadata.get("source", ""), []).append(page)
+
+    parents = []
+    for file_pages in files.values():
+        text, starts, page_meta, first = "", [], [], None
+
+        def flush():
+            if text.strip():
+                metadata = dict(first.metadata, last_page=page_meta[-1].get("page"))
+                parents.append((Document(page_content=text, metadata=metadata), starts, page_meta))
+
+        for page in sorted(file_pages, key=lambda d: d.metadata.get("page", 0)):
+            content = page.page_content.strip()
+            if not content:
+                continue
+            if len(content) > PARENT_CHUNK_SIZE:
+                #A page that alone is too long becomes parents of its own
+                flush()
+                text, starts, page_meta, first = "", [], [], None
+                for piece in splitter.split_documents([page]):
+                    parents.append((piece, [0], [page.metadata]))
+                continue
+            if text and len(text) + 2 + len(content) > PARENT_CHUNK_SIZE:
+                flush()
+                text, starts, page_meta, first = "", [], [], None
+            if text:
+                text += "\n\n"
+            first = first or page
+            starts.append(len(text))
+            page_meta.append(page.metadata)
+            text += content
+        flush()
+    return parents
+
+
+def BuildParentChildDocuments(raw_docs: List[Document]) -> Tuple[List[Document], List[Document]]:
+    """Split loaded documents into parent sections & the child chunks that get embedded"""
+    pdf_docs = [d for d in raw_docs if str(d.metadata.get("source", "")).lower().endswith(".pdf")]
+    other_docs = [d for d in raw_docs if not str(d.metadata.get("source", "")).lower().endswith(".pdf")]
+
+    parent_splitter = RecursiveCharacterTextSplitter(chunk_size=PARENT_CHUNK_SIZE, chunk_overlap=0)
+    packed = _PageParents(pdf_docs, parent_splitter)
+    packed += [(parent, [0], [parent.metadata]) for parent in parent_splitter.split_documents(other_docs)]
+
+    #Parent context travels with the child, so children need no overlap of their own
+    child_splitter = RecursiveCharacterTextSplitter(chunk_size=CHILD_CHUNK_SIZE, chunk_overlap=CHILD_CHUNK_OVERLAP,
+                                                    add_start_index=True)
+    parents, children = [], []
+    seen = set()
+    for parent, starts, page_meta in packed:
+        parent.metadata["parent_id"] = _ParentId(parent)
+        parents.append(parent)
+        for child in child_splitter.split_documents([parent]):
+            text = " ".join(child.page_content.split())
+            #Slide footers, page numbers & repeated headers add vectors but never answer anything
+            if len(text) < CHILD_MIN_CHARS or text.lower() in seen:
+                continue
+            seen.add(text.lower())
+            #Cite the page the child starts on, not the parent's first page
+            start = child.metadata.pop("start_index", 0)
+            page = page_meta[max(0, bisect.bisect_right(starts, start) - 1)]
+            child.metadata.update({key: page[key] for key in ("page", "page_label") if key in page})
+            child.metadata.pop("last_page", None)
+            children.append(child)
+
+    return parents, children
+
+
+class ParentChildStore(WrappedVectorStore):
+    """
+    Searches child chunks in the inner store & returns their parent sections.
+    k is the number of children searched, the result holds the distinct parents among
+    them (at most max_parents), each scored by its best matching child.
+    """
+
+    def __init__(self, inner: VectorStore, docstore: ParentDocstore, max_parents: int = PARENT_MAX_RESULTS):
+        super().__init__(inner)
+        self.docstore = docstore
+        self.max_parents = max_parents
+
+    def expand(self, children_with_scores: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        """Replace children with their deduplicated parents"""
+        best: Dict[str, float] = {}
+        orphans = []
+        for child, score in children_with_scores:
+            pid = child.metadata.get("parent_id")
+            if pid is None:
+                orphans.append((child, score))
+            elif pid not in best or score > best[pid]:
+                best[pid] = score
+
+        ranked = sorted(best.items(), key=lambda x: x[1], reverse=True)[:self.max_parents]
+        parents = self.docstore.get_many([pid for pid, _ in ranked])
+
+        results = [(parents[pid], score) for pid, score in ranked if pid in parents]
+        results += orphans
+        results.sort(key=lambda x: x[1], reverse=True)
+        return results[:self.max_parents]
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        children = self.inner.similarity_search_with_relevance_scores(query, k=k, **kwargs)
+        return self.expand(children)
+
+    def batch_similarity_search_with_relevance_scores(self, vectors: List[List[float]], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        return [self.expand(children) for children in super().batch_similarity_search_with_relevance_scores(vectors, k)]
+
+    def stored_vectors(self, docs: List[Document]) -> Optional[List[np.ndarray]]:
+        """The vectors of every child of each parent, a parent scores as its best child"""
+        parent_ids = [doc.metadata.get("parent_id") for doc in docs]
+        base = self.inner
+        while not hasattr(base, "_collection") and hasattr(base, "inner"):
+            base = base.inner
+        #Only Chroma can look children up by parent, the mmap index has no metadata filter
+        if not all(parent_ids) or not hasattr(base, "_collection"):
+            return None
+
+        data = base._collection.get(where={"parent_id": {"$in": list(set(parent_ids))}},
+                                    include=["embeddings", "metadatas"])
+        children: Dict[str, list] = {}
+        for vector, metadata in zip(data["embeddings"], data["metadatas"]):
+            children.setdefault((metadata or {}).get("parent_id"), []).append(vector)
+        if any(pid not in children for pid in parent_ids):
+            return None
+        matrices = [np.asarray(children[pid], dtype=np.float32) for pid in parent_ids]
+        return [m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12) for m in matrices]
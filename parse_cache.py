@@ -0,0 +1,151 @@
+"""
+Content-hash keyed cache of parsed PDFs.
+PyPDF text extraction dominates a rebuild outside of embedding, but its output only depends
+on the file bytes & the parser version, not on chunking settings. Each PDF's per-page text &
+metadata is stored once as gzip-compressed JSONL under its SHA-256, so unchanged PDFs are
+never parsed again, whichever indexing path (CLI, UI, evaluation) asks for them.
+
+Provides:
+- FileDigest(path) -> str
+- ParseCache Class
+- LoadPDFs(path, cache, workers) -> List[Document]
+"""
+
+import os
+import gzip
+import json
+import glob
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+from langchain_core.documents import Document
+from langchain_community.document_loaders import PyPDFLoader
+
+from config import PARSE_CACHE_DIR, CHUNK_WORKERS
+
+
+def FileDigest(path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ParserTag() -> str:
+    """Parser identity, a new pypdf version may extract text differently"""
+    try:
+        import pypdf
+        return f"pypdf-{pypdf.__version__}"
+    except ImportError:
+        return "pypdf"
+
+
+class ParseCache:
+    """
+    Parsed pages by content hash. A small stat index (size & mtime per path) avoids
+    re-hashing files that haven't been touched since the last run.
+    """
+
+    def __init__(self, directory: str = PARSE_CACHE_DIR):
+        self.directory = directory
+        self.tag = _ParserTag()
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.stat_path = os.path.join(directory, "stat_index.json")
+        try:
+            with open(self.stat_path) as f:
+                self.stats: Dict[str, list] = json.load(f)
+        except (OSError, ValueError):
+            self.stats = {}
+
+    def digest(self, path: str) -> str:
+        """Content hash of path, reused while its size & mtime are unchanged"""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self.lock:
+            known = self.stats.get(key)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = FileDigest(path)
+        with self.lock:
+            self.stats[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def save_index(self):
+        with self.lock:
+            data = json.dumps(self.stats)
+        tmp = self.stat_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(data)
+        os.replace(tmp, self.stat_path)
+
+    def _entry(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.{self.tag}.jsonl.gz")
+
+    def get(self, digest: str, source: str) -> Optional[List[Document]]:
+        """Cached pages for a digest, with source pointing at the file's current path"""
+        entry = self._entry(digest)
+        if not os.path.exists(entry):
+            return None
+        docs = []
+        try:
+            with gzip.open(entry, "rt", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    metadata = record["metadata"]
+                    #The same bytes may have been moved or renamed since they were parsed
+                    metadata["source"] = source
+                    if "file_path" in metadata:
+                        metadata["file_path"] = source
+                    docs.append(Document(page_content=record["page_content"], metadata=metadata))
+        except (OSError, ValueError, KeyError):
+            return None
+        return docs
+
+    def put(self, digest: str, docs: List[Document]):
+        entry = self._entry(digest)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp = f"{entry}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, default=str) + "\n")
+        os.replace(tmp, entry)
+
+
+def LoadPDFs(path: str, cache: Optional[ParseCache] = None, workers: int = CHUNK_WORKERS) -> List[Document]:
+    """Load every PDF under path, parsing only files the cache hasn't seen"""
+    cache = cache or ParseCache()
+    files = sorted(glob.glob(os.path.join(path, "**", "*.pdf"), recursive=True))
+
+    counts = {"parsed": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def load(file: str) -> List[Document]:
+        try:
+            digest = cache.digest(file)
+            docs = cache.get(digest, file)
+            if docs is None:
+                docs = PyPDFLoader(file).load()
+                cache.put(digest, docs)
+                with lock:
+                    counts["parsed"] += 1
+            return docs
+        except Exception as e:
+            print(f"Warning: Could not load {file}: {e}")
+            with lock:
+                counts["failed"] += 1
+            return []
+
+    docs = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for result in pool.map(load, files):
+            docs.extend(result)
+    cache.save_index()
+
+    if files:
+        cached = len(files) - counts["parsed"] - counts["failed"]
+        print(f"PDFs: {cached} from parse cache, {counts['parsed']} parsed, {counts['failed']} failed")
+    return docs
@@ -0,0 +1,147 @@
+"""
+Speculative retrieval while the user is still speaking.
+The voice-to-text module feeds partial transcripts to PrefetchingStore.prefetch, which
+searches the stable prefix in the background & reads the candidates' vectors back from the
+index. When the final question extends that prefix & barely changed, the final question is
+embedded once & only the prefetched candidates are re-scored against it, otherwise a fresh
+search runs as usual. Each prefetch is used at most once. Retrieval latency is hidden behind speech time.
+
+Provides:
+- PrefetchingStore Class
+- QuerySimilarity(a, b) -> float
+"""
+
+import re
+import time
+import threading
+import numpy as np
+from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Tuple, Dict, Any, Optional
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from vector_store import WrappedVectorStore, MmapVectorStore
+from config import PREFETCH_K, PREFETCH_MIN_WORDS, PREFETCH_MIN_NEW_WORDS, PREFETCH_REUSE_THRESHOLD
+
+
+def _Words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def QuerySimilarity(a: str, b: str) -> float:
+    """Word-level similarity of two queries, 1.0 when identical"""
+    return SequenceMatcher(None, _Words(a), _Words(b)).ratio()
+
+
+class _Prefetch:
+    """One in-flight or finished background search"""
+    __slots__ = ("text", "words", "future", "started")
+
+    def __init__(self, text: str, future: Future):
+        self.text = text
+        self.words = _Words(text)
+        self.future = future
+        self.started = time.perf_counter()
+
+
+class PrefetchingStore(WrappedVectorStore):
+    """
+    Vector store wrapper that can start searches on partial transcripts.
+    Searches made through it (LightRAG.retrieve, BuildChain's retriever) consume the
+    latest prefetch when the final query extends its prefix & is similar enough.
+    """
+
+    def __init__(self, inner: VectorStore, fetch_k: int = PREFETCH_K,
+                 reuse_threshold: float = PREFETCH_REUSE_THRESHOLD):
+        super().__init__(inner)
+        self.fetch_k = fetch_k
+        self.reuse_threshold = reuse_threshold
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self.lock = threading.Lock()
+        self.latest: Optional[_Prefetch] = None
+        self.counters = {"prefetches": 0, "reused": 0, "missed": 0, "hidden_s": 0.0}
+
+    def prefetch(self, partial: str):
+        """Feed a partial transcript, searches its stable prefix in the background"""
+        words = partial.split()
+        #The last word of a partial transcript is usually still changing
+        if words and not partial.endswith((" ", ".", "?", "!")):
+            words = words[:-1]
+        if len(words) < PREFETCH_MIN_WORDS:
+            return
+
+        prefix = " ".join(words)
+        with self.lock:
+            latest = self.latest
+            if latest is not None and QuerySimilarity(latest.text, prefix) >= 1.0:
+                return
+            extends = latest is not None and _Words(prefix)[:len(latest.words)] == latest.words
+            if extends and len(_Words(prefix)) - len(latest.words) < PREFETCH_MIN_NEW_WORDS:
+                return
+
+            future = self.executor.submit(self._search, prefix)
+            self.latest = _Prefetch(prefix, future)
+            self.counters["prefetches"] += 1
+
+    def _search(self, text: str) -> Tuple[List[Document], Optional[List[np.ndarray]], float]:
+        """Candidates for the prefix & the vectors the index stores for them, so the final query can re-score them"""
+        start = time.perf_counter()
+        docs = [doc for doc, _ in self.inner.similarity_search_with_relevance_scores(text, k=self.fetch_k)]
+        #Read back from the index rather than embedded again, None when the store can't (mmap parents)
+        vectors = self.stored_vectors(docs) if docs else []
+        return docs, vectors, time.perf_counter() - start
+
+    def reset(self):
+        """Forget the current prefetch, e.g. when the utterance was cancelled"""
+        with self.lock:
+            self.latest = None
+
+    def _usable(self, latest: Optional[_Prefetch], query: str, k: int, kwargs: Dict[str, Any]) -> bool:
+        """The final query must extend the prefix, the dropped last word is often the decisive one"""
+        return (latest is not None and not kwargs and k <= self.fetch_k
+                and _Words(query)[:len(latest.words)] == latest.words
+                and QuerySimilarity(latest.text, query) >= self.reuse_threshold)
+
+    def _rescore(self, query: str, docs: List[Document], vectors: List[np.ndarray], k: int) -> List[Tuple[Document, float]]:
+        """Rank the prefetched candidates by the final query, scored like a normal search"""
+        if not docs:
+            return []
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        #A parent section has one row per child & scores as its best one, like ParentChildStore
+        cosine = np.array([float((matrix @ vector).max()) for matrix in vectors])
+        order = np.argsort(-cosine)[:k]
+        return [(docs[i], MmapVectorStore._relevance(float(cosine[i]))) for i in order]
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        with self.lock:
+            latest = self.latest
+            usable = self._usable(latest, query, k, kwargs)
+            #A prefetch answers one question, a later similar one must not get its results
+            if usable:
+                self.latest = None
+
+        if usable:
+            try:
+                asked = time.perf_counter()
+                docs, vectors, duration = latest.future.result()
+                if vectors is None:
+                    raise LookupError("no stored vectors for the prefetched candidates")
+                results = self._rescore(query, docs, vectors, k)
+                with self.lock:
+                    self.counters["reused"] += 1
+                    #Search time that overlapped speech instead of delaying the answer
+                    self.counters["hidden_s"] += min(duration, asked - latest.started)
+                return results
+            except Exception:
+                pass
+
+        with self.lock:
+            self.counters["missed"] += 1
+        return self.inner.similarity_search_with_relevance_scores(query, k=k, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Prefetch counters, hidden_s is search time overlapped with speech"""
+        with self.lock:
+            return dict(self.counters)
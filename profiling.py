@@ -0,0 +1,319 @@
+"""
+Opt-in query path profiling (app.py --profile, Profile queries toggle in the UI).
+Each profiled query runs inside QueryProfiler.profile(label), label being the query mode.
+- sample: a background thread samples the stacks of every busy thread, results are written
+  as collapsed stacks (storage/profiles/<label>.collapsed) which flamegraph.pl & speedscope open directly
+- cprofile: deterministic cProfile of the calling thread & of the threads the query starts (the Normal
+  mode coalescer's producer, LangChain's parallel steps), merged into <label>.pstats (snakeviz, pstats).
+  A started thread is picked up on its first call inside the query's context, so that outermost call
+  itself is missing. Threads that were already running (the prefetch worker) are not covered, use
+  sample mode for those
+After N queries of a label a report attributes the time to project code vs LangChain, Chroma,
+the Ollama client & everything else.
+
+Provides:
+- FrameCategory(filename) -> str
+- QueryProfiler Class
+"""
+
+import os
+import sys
+import time
+import cProfile
+import contextvars
+import pstats
+import sysconfig
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from config import PROFILE_DIR, PROFILE_QUERIES, PROFILE_INTERVAL
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+
+#Checked in order, first match wins, langchain_chroma is Chroma glue so it counts as Chroma
+CATEGORIES = [
+    ("chroma", ("chromadb", "langchain_chroma")),
+    ("ollama", ("ollama", "langchain_ollama", "httpx", "httpcore")),
+    ("langchain", ("langchain", "langsmith")),
+]
+
+#Leaf frames of threads that are parked rather than working
+IDLE_LEAVES = {("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"),
+               ("threading.py", "_wait_for_tstate_lock"), ("concurrent/futures/thread.py", "_worker")}
+
+#The cProfile'd query the current context belongs to, copied into threads started with its context
+_PROFILED: contextvars.ContextVar = contextvars.ContextVar("profiled_query", default=None)
+
+
+def FrameCategory(filename: str) -> str:
+    """Which part of the stack a source file belongs to"""
+    #cProfile reports C functions under "~", frozen & generated code uses "<...>"
+    if filename.startswith(("~", "<")):
+        return "builtin"
+    path = os.path.abspath(filename).replace(os.sep, "/")
+    if "site-packages" not in path and "dist-packages" not in path:
+        if path.startswith(PROJECT_DIR.replace(os.sep, "/")):
+            return "project"
+        if path.startswith(STDLIB_DIR.replace(os.sep, "/")):
+            return "stdlib"
+    parts = path.split("/")
+    for category, packages in CATEGORIES:
+        if any(part.startswith(package) for part in parts for package in packages):
+            return category
+    return "other"
+
+
+def _FrameName(filename: str, function: str) -> str:
+    """Short frame label, file relative to the project or its package directory"""
+    path = filename.replace(os.sep, "/")
+    for marker in ("site-packages/", "dist-packages/"):
+        if marker in path:
+            path = path.split(marker, 1)[1]
+            break
+    else:
+        if path.startswith(PROJECT_DIR.replace(os.sep, "/")):
+            path = os.path.relpath(filename, PROJECT_DIR)
+        else:
+            path = os.path.basename(path)
+    return f"{path}:{function}"
+
+
+class _Profile:
+    """Accumulated results for one label"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.stacks: Counter = Counter()
+        self.self_time: Counter = Counter()   # category -> samples or seconds
+        self.project_time: Counter = Counter()  # project function -> inclusive samples or seconds
+        self.cprofile: Optional[cProfile.Profile] = None
+        self.threads: List[cProfile.Profile] = []  # profilers of threads the queries started
+        self.reported = False
+
+
+class _Snapshot:
+    """Reads a profiler's stats for pstats without disabling it, Profile.create_stats would
+    disable whatever profiler runs on the reading thread"""
+
+    def __init__(self, profiler: cProfile.Profile):
+        self.profiler = profiler
+        self.stats = {}
+
+    def create_stats(self):
+        self.profiler.snapshot_stats()
+        self.stats = self.profiler.stats
+
+
+class QueryProfiler:
+    """
+    Profiles the first `queries` queries of every label.
+    Sampling looks at every thread, so chain work done on the coalescer or prefetch threads is included.
+    Concurrent queries with different labels share their samples.
+    """
+
+    def __init__(self, mode: str = "sample", queries: int = PROFILE_QUERIES, interval: float = PROFILE_INTERVAL,
+                 output_dir: str = PROFILE_DIR):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Unknown profiler mode: {mode}")
+        self.mode = mode
+        self.queries = queries
+        self.interval = interval
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.profiles: Dict[str, _Profile] = {}
+        self.active: Counter = Counter()
+        self.sampler: Optional[threading.Thread] = None
+
+    def wants(self, label: str) -> bool:
+        """True while label still has queries left to profile"""
+        with self.lock:
+            profile = self.profiles.get(label)
+            return profile is None or profile.queries < self.queries
+
+    @contextmanager
+    def profile(self, label: str):
+        """Profile the enclosed query under label, a no-op once label has its N queries"""
+        if not self.wants(label):
+            yield
+            return
+
+        with self.lock:
+            profile = self.profiles.setdefault(label, _Profile())
+            if self.mode == "cprofile":
+                profile.cprofile = profile.cprofile or cProfile.Profile()
+
+        if self.mode == "cprofile":
+            try:
+                profile.cprofile.enable()
+            except ValueError as e:
+                #Python 3.12+ allows one profiler at a time, e.g. a debugger or another label's query holds it
+                print(f"Profiler: {label} query not profiled ({e})")
+                profile = None
+        if profile is None:
+            yield
+            return
+
+        #Counted as active only once profiling is on, the finally below always undoes it
+        start = time.perf_counter()
+        token = None
+        try:
+            with self.lock:
+                self.active[label] += 1
+                if self.mode == "sample" and (self.sampler is None or not self.sampler.is_alive()):
+                    self.sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                    self.sampler.start()
+            if self.mode == "cprofile":
+                token = _PROFILED.set(profile)
+                #cProfile only sees the thread that enabled it, threads started from here on check in via _follow
+                threading.setprofile(self._follow)
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.mode == "cprofile":
+                profile.cprofile.disable()
+                if token is not None:
+                    _PROFILED.reset(token)
+            with self.lock:
+                self.active[label] -= 1
+                if not self.active[label]:
+                    del self.active[label]
+                if self.mode == "cprofile" and not self.active:
+                    threading.setprofile(None)
+                profile.queries += 1
+                profile.seconds += elapsed
+            self._write(label, profile)
+
+    def _follow(self, frame, event, arg):
+        """
+        Profile hook of threads started during a cProfile'd query, called until the thread
+        runs inside a profiled query's context, then replaced by that thread's own cProfile
+        """
+        #No locking in here, the hook also fires inside this class's own locked sections
+        profile = _PROFILED.get()
+        if profile is None:
+            if not self.active:
+                sys.setprofile(None)
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            #Python 3.12+ runs cProfile on sys.monitoring, which covers every thread & allows one profiler
+            sys.setprofile(None)
+            return
+        profile.threads.append(profiler)
+
+    def _sample(self):
+        """Sampler thread, runs while any profiled query is in flight"""
+        me = threading.get_ident()
+        while True:
+            with self.lock:
+                labels = list(self.active)
+            if not labels:
+                return
+
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append((frame.f_code.co_filename, frame.f_code.co_name))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                leaf_file, leaf_function = stack[0]
+                if any(leaf_file.replace(os.sep, "/").endswith(f) and leaf_function == fn for f, fn in IDLE_LEAVES):
+                    continue
+
+                #Standard library time (socket reads, json, threading) counts toward the code that called it
+                categories = [FrameCategory(f) for f, _ in stack]
+                category = next((c for c in categories if c not in ("stdlib", "builtin")), categories[0])
+
+                stack.reverse()
+                collapsed = ";".join(_FrameName(f, fn) for f, fn in stack)
+                project = {_FrameName(f, fn) for f, fn in stack if FrameCategory(f) == "project"}
+                with self.lock:
+                    for label in labels:
+                        profile = self.profiles[label]
+                        profile.stacks[collapsed] += 1
+                        profile.self_time[category] += 1
+                        profile.project_time.update(project)
+
+            time.sleep(self.interval)
+
+    def _write(self, label: str, profile: _Profile):
+        """Write the profile files for label & print the report once it has all its queries"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.mode == "sample":
+            with self.lock:
+                lines = [f"{stack} {count}" for stack, count in profile.stacks.most_common()]
+            path = os.path.join(self.output_dir, f"{label}.collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        else:
+            path = os.path.join(self.output_dir, f"{label}.pstats")
+            stats = self._cprofile_stats(profile)
+            stats.dump_stats(path)
+            self._attribute_cprofile(profile, stats)
+
+        if profile.queries >= self.queries and not profile.reported:
+            profile.reported = True
+            print(self.report(label))
+            print(f"Profile written to {path}")
+
+    def _cprofile_stats(self, profile: _Profile) -> pstats.Stats:
+        """The calling thread's profile merged with the profiles of the threads they started"""
+        stats = pstats.Stats(_Snapshot(profile.cprofile))
+        for profiler in list(profile.threads):
+            stats.add(_Snapshot(profiler))
+        return stats
+
+    def _attribute_cprofile(self, profile: _Profile, stats: pstats.Stats):
+        """Category self time & project inclusive time from the cProfile stats"""
+        profile.self_time.clear()
+        profile.project_time.clear()
+        for (filename, _, function), (_, _, tottime, cumtime, _) in stats.stats.items():
+            category = FrameCategory(filename)
+            profile.self_time[category] += tottime
+            if category == "project":
+                profile.project_time[_FrameName(filename, function)] += cumtime
+
+    def summary(self, label: str) -> Dict[str, object]:
+        """Share of self time per category & the heaviest project functions"""
+        with self.lock:
+            profile = self.profiles.get(label)
+            if profile is None:
+                return {}
+            total = sum(profile.self_time.values()) or 1
+            return {
+                "queries": profile.queries,
+                "avg_query_s": profile.seconds / max(1, profile.queries),
+                "self_share": {c: t / total for c, t in profile.self_time.most_common()},
+                "project_functions": [(name, t / total) for name, t in profile.project_time.most_common(10)]
+            }
+
+    def report(self, label: str) -> str:
+        """Readable summary for one label"""
+        summary = self.summary(label)
+        if not summary:
+            return f"No profile for {label}"
+        lines = [
+            "=" * 60,
+            f"PROFILE: {label} ({summary['queries']} queries, {summary['avg_query_s']:.2f}s avg, {self.mode})",
+            "=" * 60,
+            "Self time by component:"
+        ]
+        lines += [f"  {category:>10}  {share:6.1%}" for category, share in summary["self_share"].items()]
+        lines.append("Project functions (inclusive):")
+        lines += [f"  {share:6.1%}  {name}" for name, share in summary["project_functions"]]
+        return "\n".join(lines)
+
+    def reports(self) -> List[Tuple[str, str]]:
+        """(label, report) for every profiled label"""
+        with self.lock:
+            labels = list(self.profiles)
+        return [(label, self.report(label)) for label in labels]
@@ -0,0 +1,40 @@
+"""
+Retrieval helpers shared by Normal mode (llm.BuildChain, ui.py) & LightRAG.
+
+Provides:
+- AdaptiveCutoff(docs_with_scores, max_k, min_k) -> List[Tuple[Document, float]]
+- RetrieveDocuments(db, query, k, adaptive) -> List[Tuple[Document, float]]
+"""
+
+from typing import List, Tuple
+from langchain_core.documents import Document
+
+from config import ADAPTIVE_K, ADAPTIVE_MIN_K, ADAPTIVE_MIN_SCORE, ADAPTIVE_MAX_DROP, ADAPTIVE_GAP
+
+
+def AdaptiveCutoff(docs_with_scores: List[Tuple[Document, float]], max_k: int,
+                   min_k: int = ADAPTIVE_MIN_K) -> List[Tuple[Document, float]]:
+    """
+    Keep only as many chunks as the relevance scores support, between min_k & max_k.
+    Stops at the first chunk that falls under the absolute floor, drops too far below
+    the best chunk, or sits after a large gap from its neighbour.
+    """
+    ranked = sorted(docs_with_scores, key=lambda x: x[1], reverse=True)[:max_k]
+    if not ranked:
+        return ranked
+
+    top = ranked[0][1]
+    keep = min(min_k, len(ranked))
+    for i in range(keep, len(ranked)):
+        score = ranked[i][1]
+        if score < ADAPTIVE_MIN_SCORE or top - score > ADAPTIVE_MAX_DROP or ranked[i - 1][1] - score >= ADAPTIVE_GAP:
+            break
+        keep = i + 1
+
+    return ranked[:keep]
+
+
+def RetrieveDocuments(db, query: str, k: int, adaptive: bool = ADAPTIVE_K) -> List[Tuple[Document, float]]:
+    """Top-k documents with relevance scores, cut down adaptively when enabled"""
+    results = db.similarity_search_with_relevance_scores(query, k=k)
+    return AdaptiveCutoff(results, max_k=k) if adaptive else results
@@ -0,0 +1,186 @@
+"""
+Retrieval result cache shared by every vector store wrapper in the process.
+Keyed by (store, index generation, normalized query, k, filters) with LRU eviction & a TTL.
+The index generation is a counter on disk bumped whenever the database is rebuilt, so
+results from an old index are never served, even to another process or UI session.
+Hits skip both the query embedding & the vector search. Chunks from the chunk store are
+cached as ids & re-materialized on a hit, anything else is cached as returned.
+
+Provides:
+- IndexGeneration() -> int
+- BumpIndexGeneration() -> int
+- RetrievalCache Class
+- CachedVectorStore Class
+- RETRIEVAL_CACHE (process-wide RetrievalCache)
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Tuple, Dict, Any, Optional, Hashable
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from coalesce import NormalizeQuery
+from vector_store import WrappedVectorStore
+from config import INDEX_GENERATION_PATH, RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL
+
+_generation = {"mtime_ns": None, "value": 0}
+_generation_lock = threading.Lock()
+
+
+def IndexGeneration(path: str = INDEX_GENERATION_PATH) -> int:
+    """Current index generation, re-read only when the file changes"""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+    with _generation_lock:
+        if mtime_ns != _generation["mtime_ns"]:
+            try:
+                with open(path) as f:
+                    _generation["value"] = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                _generation["value"] = 0
+            _generation["mtime_ns"] = mtime_ns
+        return _generation["value"]
+
+
+def BumpIndexGeneration(path: str = INDEX_GENERATION_PATH) -> int:
+    """Mark the index as rebuilt, every cached retrieval from before becomes stale"""
+    generation = IndexGeneration(path) + 1
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(str(generation))
+    return generation
+
+
+class _Entry:
+    __slots__ = ("results", "by_id", "expires")
+
+    def __init__(self, results: list, by_id: bool, expires: float):
+        self.results = results
+        self.by_id = by_id
+        self.expires = expires
+
+
+class RetrievalCache:
+    """LRU + TTL map from retrieval keys to ranked results, safe to share between threads"""
+
+    def __init__(self, max_size: int = RETRIEVAL_CACHE_SIZE, ttl: float = RETRIEVAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.generation: Optional[int] = None
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidated": 0}
+
+    def get(self, key: Hashable) -> Optional[_Entry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires < time.monotonic():
+                del self.entries[key]
+                self.counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry
+
+    def put(self, key: Hashable, results: list, by_id: bool):
+        with self.lock:
+            self.entries[key] = _Entry(results, by_id, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    def check_generation(self, generation: int):
+        """Drop everything once the index has been rebuilt, the keys would never match again"""
+        with self.lock:
+            if self.generation != generation:
+                if self.generation is not None:
+                    self.counters["invalidated"] += len(self.entries)
+                    self.entries.clear()
+                self.generation = generation
+
+    def clear(self):
+        with self.lock:
+            self.counters["invalidated"] += len(self.entries)
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus hit_rate & current size"""
+        with self.lock:
+            stats = dict(self.counters)
+            stats["size"] = len(self.entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+RETRIEVAL_CACHE = RetrievalCache()
+
+
+def _FindChunkStore(db: VectorStore):
+    """The chunk store under a stack of wrappers, if any"""
+    while db is not None:
+        if hasattr(db, "store") and hasattr(db.store, "record"):
+            return db.store
+        db = getattr(db, "inner", None)
+    return None
+
+
+class CachedVectorStore(WrappedVectorStore):
+    """
+    Serves repeated retrievals (re-asked questions, retries, the warm-up's questions)
+    from RETRIEVAL_CACHE instead of re-embedding & re-searching.
+    """
+
+    def __init__(self, inner: VectorStore, cache: Optional[RetrievalCache] = None, namespace: Optional[str] = None):
+        super().__init__(inner)
+        self.cache = cache or RETRIEVAL_CACHE
+        self.namespace = namespace or type(inner).__name__
+        self.chunk_store = _FindChunkStore(inner)
+
+    def _key(self, query: str, k: int, kwargs: Dict[str, Any]) -> Hashable:
+        generation = IndexGeneration()
+        self.cache.check_generation(generation)
+        filters = json.dumps(kwargs, sort_keys=True, default=str) if kwargs else ""
+        return (self.namespace, generation, NormalizeQuery(query), k, filters)
+
+    def _pack(self, results: List[Tuple[Document, float]]) -> Tuple[list, bool]:
+        """Chunk ids when every hit can be re-read from the chunk store, otherwise the documents"""
+        if self.chunk_store is not None and all(
+            self.chunk_store.record(doc.metadata.get("chunk_id", "")) is not None for doc, _ in results
+        ):
+            return [(doc.metadata["chunk_id"], score) for doc, score in results], True
+        return list(results), False
+
+    def _unpack(self, entry) -> Optional[List[Tuple[Document, float]]]:
+        if not entry.by_id:
+            return list(entry.results)
+        records = [(self.chunk_store.record(chunk_id), score) for chunk_id, score in entry.results]
+        if any(record is None for record, _ in records):
+            return None
+        return [(self.chunk_store.document(record), score) for record, score in records]
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        key = self._key(query, k, kwargs)
+        entry = self.cache.get(key)
+        if entry is not None:
+            results = self._unpack(entry)
+            if results is not None:
+                return results
+
+        results = self.inner.similarity_search_with_relevance_scores(query, k=k, **kwargs)
+        packed, by_id = self._pack(results)
+        self.cache.put(key, packed, by_id)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
@@ -0,0 +1,97 @@
+"""
+Model cascade: easy questions are answered by the small model, hard ones by the large one.
+The route is picked per query from features that are already on hand before generation
+(question length, calculation wording, retrieval scores), so routing itself costs nothing.
+LightRAG can additionally escalate a small-model answer that is poorly grounded in its evidence.
+
+Provides:
+- QueryFeatures(query, docs_with_scores) -> dict
+- ModelRouter Class
+- SelectModel(llm, query, docs_with_scores) -> chat model
+"""
+
+import re
+import threading
+from typing import List, Tuple, Dict, Any, Optional
+from langchain_core.documents import Document
+
+from config import ROUTER_MAX_WORDS, ROUTER_MIN_SCORE, ROUTER_CALC_KEYWORDS, ROUTER_ESCALATE_OVERLAP
+
+_CALC_PATTERN = re.compile(r"\b(" + "|".join(re.escape(word) for word in ROUTER_CALC_KEYWORDS) + r")\b", re.IGNORECASE)
+#Numbers with units ("12 V", "4.7 kOhm", "60Hz") usually mean a worked calculation
+_QUANTITY_PATTERN = re.compile(r"\d+(\.\d+)?\s*(m|u|k|M)?(V|A|Hz|F|H|W|[Oo]hms?|Ω)\b")
+
+
+def QueryFeatures(query: str, docs_with_scores: Optional[List[Tuple[Document, float]]] = None) -> Dict[str, Any]:
+    """Cheap per-query signals used for routing"""
+    scores = [score for _, score in docs_with_scores or []]
+    return {
+        "words": len(query.split()),
+        "calculation": bool(_CALC_PATTERN.search(query) or _QUANTITY_PATTERN.search(query)),
+        "top_score": max(scores) if scores else None
+    }
+
+
+class ModelRouter:
+    """
+    Chooses between a small & a large chat model per question.
+    Goes to the large model for calculations, long questions & weak retrieval, everything
+    else stays on the small one. Route counts & latencies are kept for reporting, recorded by
+    Normal mode (llm.RoutedModel) & LightRAG alike. Only LightRAG escalates.
+    """
+
+    def __init__(self, small, large, max_words: int = ROUTER_MAX_WORDS, min_score: float = ROUTER_MIN_SCORE,
+                 escalate_overlap: float = ROUTER_ESCALATE_OVERLAP):
+        self.models = {"small": small, "large": large}
+        self.max_words = max_words
+        self.min_score = min_score
+        self.escalate_overlap = escalate_overlap
+        self.lock = threading.Lock()
+        self.counters = {route: {"queries": 0, "latency_s": 0.0} for route in ("small", "large", "escalated")}
+
+    @property
+    def model(self) -> str:
+        """Identifies the pair in coalescing keys, like ChatOllama.model does for one model"""
+        return f"router:{self.models['small'].model}/{self.models['large'].model}"
+
+    def route(self, query: str, docs_with_scores: Optional[List[Tuple[Document, float]]] = None) -> Tuple[str, List[str]]:
+        """"small" or "large" & the reasons for escalating"""
+        features = QueryFeatures(query, docs_with_scores)
+        reasons = []
+        if features["calculation"]:
+            reasons.append("calculation")
+        if features["words"] > self.max_words:
+            reasons.append("long question")
+        if features["top_score"] is not None and features["top_score"] < self.min_score:
+            reasons.append("weak retrieval")
+        return ("large" if reasons else "small"), reasons
+
+    def select(self, query: str, docs_with_scores: Optional[List[Tuple[Document, float]]] = None):
+        """Chat model for this question"""
+        route, _ = self.route(query, docs_with_scores)
+        return self.models[route]
+
+    def should_escalate(self, evidence: List[Dict[str, Any]]) -> bool:
+        """True when a small-model answer barely overlaps its best evidence (LightRAG compute_overlap output)"""
+        if not self.escalate_overlap or not evidence:
+            return False
+        return max(ev["overlap_score"] for ev in evidence) < self.escalate_overlap
+
+    def record(self, route: str, latency_s: float):
+        with self.lock:
+            self.counters[route]["queries"] += 1
+            self.counters[route]["latency_s"] += latency_s
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Queries & average latency per route"""
+        with self.lock:
+            return {
+                route: {"queries": row["queries"],
+                        "avg_latency_s": row["latency_s"] / row["queries"] if row["queries"] else 0.0}
+                for route, row in self.counters.items()
+            }
+
+
+def SelectModel(llm, query: str, docs_with_scores: Optional[List[Tuple[Document, float]]] = None):
+    """The model to answer with, llm itself unless it is a ModelRouter"""
+    return llm.select(query, docs_with_scores) if isinstance(llm, ModelRouter) else llm
@@ -0,0 +1,285 @@
+"""
+Searchable index over the saved chat sessions in storage/sessions.
+Messages are kept in a SQLite FTS5 table with their timestamps & cited sources. The index
+is refreshed incrementally, only session files whose size or mtime changed are re-read,
+so searches stay fast with thousands of sessions on disk.
+run using python session_index.py <search|top> ...
+
+Provides:
+- SessionIndex Class
+- ExportTopQuestions(path, n, index) -> int
+"""
+
+import os
+import re
+import csv
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, date
+from typing import List, Dict, Any, Optional, Union
+
+from coalesce import NormalizeQuery
+from config import SESSIONS_DIR, SESSION_INDEX_PATH
+
+SOURCE_PATTERN = re.compile(r"^(.*) \(Page (.*)\)$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY, session_id TEXT, position INTEGER, role TEXT,
+    content TEXT, normalized TEXT, timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id);
+CREATE INDEX IF NOT EXISTS messages_question ON messages (role, normalized);
+CREATE INDEX IF NOT EXISTS messages_time ON messages (timestamp);
+CREATE TABLE IF NOT EXISTS sources (message_id INTEGER, source TEXT, page TEXT);
+CREATE INDEX IF NOT EXISTS sources_message ON sources (message_id);
+CREATE INDEX IF NOT EXISTS sources_source ON sources (source);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (content, content='messages', content_rowid='id');
+"""
+
+TimeBound = Optional[Union[str, date, datetime]]
+
+
+def _Bound(value: TimeBound, end: bool = False) -> Optional[str]:
+    """ISO string for a date filter, a bare date as the upper bound covers the whole day"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        value = value.isoformat()
+    if end and len(value) == 10:
+        return value + "T23:59:59.999999"
+    return value
+
+
+def _FtsQuery(keywords: str) -> str:
+    """Quote every term so user input never reaches the FTS5 query syntax"""
+    terms = re.findall(r"\w+", keywords)
+    return " ".join('"' + t + '"' for t in terms)
+
+
+class SessionIndex:
+    """Incrementally refreshed FTS index of session messages, safe to share between threads"""
+
+    def __init__(self, path: str = SESSION_INDEX_PATH, sessions_dir: str = SESSIONS_DIR):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.sessions_dir = sessions_dir
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def refresh(self) -> Dict[str, int]:
+        """Index new & changed session files & drop deleted ones"""
+        on_disk = {}
+        if os.path.isdir(self.sessions_dir):
+            for entry in os.scandir(self.sessions_dir):
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    on_disk[entry.name[:-5]] = (stat.st_mtime_ns, stat.st_size, entry.path)
+
+        with self.lock:
+            known = {sid: (mtime, size) for sid, mtime, size in
+                     self.conn.execute("SELECT session_id, mtime_ns, size FROM sessions")}
+
+        changed = [sid for sid, (mtime, size, _) in on_disk.items() if known.get(sid) != (mtime, size)]
+        removed = [sid for sid in known if sid not in on_disk]
+
+        with self.lock, self.conn:
+            for sid in removed:
+                self._remove(sid)
+            for sid in changed:
+                mtime, size, path = on_disk[sid]
+                try:
+                    with open(path, "r") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                self._remove(sid)
+                self._insert(sid, data, mtime, size)
+
+        return {"indexed": len(changed), "removed": len(removed), "sessions": len(on_disk)}
+
+    def _remove(self, session_id: str):
+        rows = self.conn.execute(
+            "SELECT id, content FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchall()
+        #External content FTS tables need the old text to delete their entries
+        self.conn.executemany(
+            "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', ?, ?)", rows
+        )
+        self.conn.executemany("DELETE FROM sources WHERE message_id = ?", [(mid,) for mid, _ in rows])
+        self.conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _insert(self, session_id: str, data: Dict[str, Any], mtime_ns: int, size: int):
+        saved_at = data.get("timestamp")
+        self.conn.execute(
+            "INSERT INTO sessions VALUES (?, ?, ?, ?)", (session_id, mtime_ns, size, saved_at)
+        )
+        for position, msg in enumerate(data.get("messages", [])):
+            role = "user" if msg.get("role") in ("user", "human") else "assistant"
+            content = msg.get("content", "")
+            cursor = self.conn.execute(
+                "INSERT INTO messages (session_id, position, role, content, normalized, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, position, role, content,
+                 NormalizeQuery(content) if role == "user" else None, msg.get("timestamp") or saved_at)
+            )
+            self.conn.execute(
+                "INSERT INTO messages_fts (rowid, content) VALUES (?, ?)", (cursor.lastrowid, content)
+            )
+            for cited in msg.get("sources") or []:
+                match = SOURCE_PATTERN.match(cited)
+                source, page = match.groups() if match else (cited, None)
+                self.conn.execute("INSERT INTO sources VALUES (?, ?, ?)", (cursor.lastrowid, source, page))
+
+    def search(self, keywords: str = "", since: TimeBound = None, until: TimeBound = None,
+               source: Optional[str] = None, role: Optional[str] = None, limit: int = 50,
+               refresh: bool = True) -> List[Dict[str, Any]]:
+        """
+        Messages matching every given filter, best keyword matches first (newest first without keywords).
+        source matches any cited document path containing it, a message's sources are those it cited.
+        """
+        if refresh:
+            self.refresh()
+
+        query = _FtsQuery(keywords)
+        where, params = [], []
+        if query:
+            sql = ("SELECT m.id, m.session_id, m.position, m.role, m.content, m.timestamp, "
+                   "snippet(messages_fts, 0, '[', ']', '...', 16) FROM messages_fts "
+                   "JOIN messages m ON m.id = messages_fts.rowid")
+            where.append("messages_fts MATCH ?")
+            params.append(query)
+            order = "bm25(messages_fts)"
+        else:
+            sql = ("SELECT m.id, m.session_id, m.position, m.role, m.content, m.timestamp, NULL "
+                   "FROM messages m")
+            order = "m.timestamp DESC"
+
+        if since is not None:
+            where.append("m.timestamp >= ?")
+            params.append(_Bound(since))
+        if until is not None:
+            where.append("m.timestamp <= ?")
+            params.append(_Bound(until, end=True))
+        if role is not None:
+            where.append("m.role = ?")
+            params.append(role)
+        if source:
+            where.append("m.id IN (SELECT message_id FROM sources WHERE source LIKE ?)")
+            params.append(f"%{source}%")
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+            cited = self._sources([row[0] for row in rows])
+
+        return [
+            {
+                "session_id": session_id,
+                "position": position,
+                "role": role,
+                "content": content,
+                "snippet": snippet or content[:200],
+                "timestamp": timestamp,
+                "sources": cited.get(mid, [])
+            }
+            for mid, session_id, position, role, content, timestamp, snippet in rows
+        ]
+
+    def _sources(self, message_ids: List[int]) -> Dict[int, List[str]]:
+        if not message_ids:
+            return {}
+        marks = ",".join("?" * len(message_ids))
+        cited: Dict[int, List[str]] = {}
+        for mid, source, page in self.conn.execute(
+            f"SELECT message_id, source, page FROM sources WHERE message_id IN ({marks})", message_ids
+        ):
+            cited.setdefault(mid, []).append(f"{source} (Page {page})" if page is not None else source)
+        return cited
+
+    def top_questions(self, n: int = 20, since: TimeBound = None, refresh: bool = True) -> List[Dict[str, Any]]:
+        """Most frequently asked user questions, grouped by normalized text"""
+        if refresh:
+            self.refresh()
+
+        sql = ("SELECT normalized, MAX(content), COUNT(*), COUNT(DISTINCT session_id), MAX(timestamp) "
+               "FROM messages WHERE role = 'user' AND normalized != ''")
+        params: List[Any] = []
+        if since is not None:
+            sql += " AND timestamp >= ?"
+            params.append(_Bound(since))
+        sql += " GROUP BY normalized ORDER BY COUNT(*) DESC, MAX(timestamp) DESC LIMIT ?"
+        params.append(n)
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [
+            {"input": text, "count": count, "sessions": sessions, "last_asked": last}
+            for _, text, count, sessions, last in rows
+        ]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def ExportTopQuestions(path: str, n: int = 20, index: Optional[SessionIndex] = None) -> int:
+    """Write the top-N questions as CSV, the input column reads like the eval set & batch files"""
+    index = index or SessionIndex()
+    rows = index.top_questions(n)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["input", "count", "sessions", "last_asked"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="ECEN 214 Lab Assistant - session archive search")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="Search saved conversations")
+    search.add_argument("keywords", nargs="?", default="", help="Words to search for")
+    search.add_argument("--since", help="Earliest date or ISO timestamp")
+    search.add_argument("--until", help="Latest date or ISO timestamp")
+    search.add_argument("--source", help="Only messages citing a document path containing this")
+    search.add_argument("--role", choices=["user", "assistant"], help="Only questions or only answers")
+    search.add_argument("-n", "--limit", type=int, default=20, help="Maximum results")
+
+    top = commands.add_parser("top", help="Most frequently asked questions")
+    top.add_argument("-n", type=int, default=20, help="Number of questions")
+    top.add_argument("-o", "--output", help="Write the questions to a CSV file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    index = SessionIndex()
+    print(f"Index refreshed: {index.refresh()}")
+
+    if args.command == "search":
+        for hit in index.search(args.keywords, args.since, args.until, args.source, args.role, args.limit, refresh=False):
+            print(f"\n[{hit['session_id']} #{hit['position']}] {hit['role']} {hit['timestamp']}")
+            print(f"  {hit['snippet']}")
+            for s in hit["sources"]:
+                print(f"  - {s}")
+    elif args.output:
+        count = ExportTopQuestions(args.output, args.n, index)
+        print(f"Wrote {count} questions to {args.output}")
+    else:
+        for row in index.top_questions(args.n, refresh=False):
+            print(f"{row['count']:>4}  {row['input']}")
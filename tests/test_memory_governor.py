@@ -0,0 +1,118 @@
+"""
+MemoryGovernor with simulated readings, a fake clock & recording actions, no torch or Ollama needed.
+"""
+
+import sys
+import types
+
+import memory_governor
+from memory_governor import MemoryGovernor
+
+
+class FakeMemory:
+    """Reader whose values the test sets, actions can change them to simulate freeing memory"""
+
+    def __init__(self, rss_mb=500.0, available_mb=4000.0, device_mb=0.0):
+        self.reading = {"rss_mb": rss_mb, "available_mb": available_mb, "device_mb": device_mb}
+
+    def __call__(self):
+        return dict(self.reading)
+
+
+def MakeGovernor(memory, effects=None, **kwargs):
+    """Governor whose actions record their name & apply effects[name](memory.reading)"""
+    calls = []
+    clock = {"now": 0.0}
+
+    def action(name):
+        def run():
+            calls.append(name)
+            if effects and name in effects:
+                effects[name](memory.reading)
+        return run
+
+    governor = MemoryGovernor(
+        reader=memory,
+        actions={name: action(name) for name in ("collect", "release_device", "unload_models")},
+        clock=lambda: clock["now"], log=lambda message: None,
+        rss_soft_mb=1500, available_min_mb=700, device_soft_mb=1024, cooldown=30, max_cooldown=240,
+        **kwargs
+    )
+    return governor, calls, clock
+
+
+def test_quiet_reading_runs_nothing():
+    governor, calls, _ = MakeGovernor(FakeMemory())
+    assert governor.check() == []
+    assert calls == []
+
+
+def test_low_available_memory_escalates_in_order():
+    governor, calls, _ = MakeGovernor(FakeMemory(rss_mb=2000, available_mb=300, device_mb=2000))
+    governor.check()
+    assert calls == ["collect", "release_device", "unload_models"]
+
+
+def test_escalation_stops_once_memory_recovers():
+    def release(reading):
+        reading["available_mb"] = 3000
+        reading["device_mb"] = 0
+
+    governor, calls, _ = MakeGovernor(FakeMemory(rss_mb=2000, available_mb=300, device_mb=2000),
+                                      effects={"release_device": release})
+    governor.check()
+    assert calls == ["collect", "release_device"]
+
+
+def test_fruitless_collect_backs_off_up_to_max_cooldown():
+    governor, calls, clock = MakeGovernor(FakeMemory(rss_mb=2000))
+    runs = []
+    while clock["now"] <= 1000:
+        if governor.check():
+            runs.append(clock["now"])
+        clock["now"] += 5
+    #30s doubles on every collect that frees nothing: 60, 120, 240 & then capped at 240
+    assert runs == [0, 60, 180, 420, 660, 900]
+    assert governor.cooldowns["collect"] == 240
+
+
+def test_backoff_resets_when_collect_frees_memory_or_pressure_ends():
+    memory = FakeMemory(rss_mb=2000)
+    governor, calls, clock = MakeGovernor(memory)
+    governor.check()
+    assert governor.cooldowns["collect"] == 60
+
+    memory.reading["rss_mb"] = 1000
+    governor.check()
+    assert "collect" not in governor.cooldowns
+
+    def frees(reading):
+        reading["rss_mb"] -= 200
+
+    governor, calls, clock = MakeGovernor(FakeMemory(rss_mb=2000), effects={"collect": frees})
+    governor.check()
+    assert "collect" not in governor.cooldowns
+
+
+def test_requested_cleanup_skips_the_cooldown():
+    governor, calls, clock = MakeGovernor(FakeMemory(rss_mb=2000))
+    governor.check()
+    clock["now"] = 1
+    governor.request_cleanup()
+    governor.check()
+    assert calls == ["collect", "collect", "release_device"]
+
+
+def test_unload_keeps_serving_models(monkeypatch):
+    unloaded = []
+    fake = types.ModuleType("ollama")
+    fake.ps = lambda: {"models": [{"model": "llama3.2:1b"}, {"model": "llama3.2:3b"},
+                                  {"model": "nomic-embed-text:latest"}]}
+    fake.generate = lambda model, prompt, keep_alive: unloaded.append((model, keep_alive))
+    monkeypatch.setitem(sys.modules, "ollama", fake)
+
+    #Default: everything loaded except what the app keeps, a different tag is a different model
+    assert memory_governor._UnloadModels(None, ["llama3.2:1b", "nomic-embed-text"]) == ["llama3.2:3b"]
+    assert unloaded == [("llama3.2:3b", 0)]
+    #An explicit list limits the unloads to those models
+    assert memory_governor._UnloadModels(["nomic-embed-text"], []) == ["nomic-embed-text:latest"]
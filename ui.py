@@ -7,16 +7,25 @@ load_dotenv(dotenv_path=".env", override=True)
 
 import streamlit as st
 import os
-from langchain_ollama import ChatOllama
+from contextlib import nullcontext
+from datetime import datetime
 from langsmith import traceable
 
-from database_bridge import InitializeDatabase, SaveSession, ListSessions, LoadSession, ClearCudaCache, CombineDocuments
-from llm import GetSession, ClearSession
+from database_bridge import InitializeDatabase, SaveSession, ListSessions, LoadSession, CombineDocuments, DatabaseExists
+from llm import GetSession, ClearSession, CreateLLM, BuildPrompt, RoutedModel
 from lightrag import LightRAG
+from coalesce import CoalesceChain, QUERY_COALESCER
+from retrieval import RetrieveDocuments
+from memory_governor import StartGovernor
+from profiling import QueryProfiler
+from session_index import SessionIndex
+from warmup import StartupWarmUp
+from retrieval_cache import RETRIEVAL_CACHE
+from router import ModelRouter
 from model import GetListOfModels
-from config import DEFAULT_EMBEDDING_MODEL, DEFAULT_DOCS_PATH, DEFAULT_MODEL, CHROMA_DIR, ANSWER_PROMPT, RETRIEVER_K, LLM_TEMPERATURE, LLM_TOP_P, LLM_MAX_TOKENS
+from config import DEFAULT_EMBEDDING_MODEL, DEFAULT_DOCS_PATH, DEFAULT_MODEL, RETRIEVER_K, WARMUP_ENABLED
+from config import ROUTER_ENABLED, ROUTER_LARGE_MODEL
 
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
@@ -35,8 +44,17 @@ if "messages" not in st.session_state:
 if "query_count" not in st.session_state:
     st.session_state.query_count = 0
 
+# Memory cleanup runs on the governor thread when thresholds are crossed, never in a request
+governor = StartGovernor()
+
+
+def profiled(label):
+    """Profile the enclosed work when the sidebar profiling toggle is on"""
+    profiler = st.session_state.get("profiler")
+    return profiler.profile(label) if profiler else nullcontext()
+
 if "db" not in st.session_state:
-    if os.path.isdir(CHROMA_DIR) and os.listdir(CHROMA_DIR):
+    if DatabaseExists():
         try:
             with st.spinner("Loading database..."):
                 st.session_state.db = InitializeDatabase(
@@ -51,14 +69,14 @@ if "db" not in st.session_state:
         st.session_state.db = None
 
 if "llm" not in st.session_state:
-    st.session_state.llm = ChatOllama(
-            model=DEFAULT_MODEL,
-            temperature=LLM_TEMPERATURE,
-            top_p=LLM_TOP_P,
-            num_predict=LLM_MAX_TOKENS
-        )
+    st.session_state.llm = CreateLLM(DEFAULT_MODEL)
     st.session_state.current_model = DEFAULT_MODEL
 
+if "warmed_up" not in st.session_state and WARMUP_ENABLED and st.session_state.db is not None:
+    # Replays frequent questions once per process so the first students get warm caches
+    with st.spinner("Warming up..."):
+        st.session_state.warmed_up = StartupWarmUp(st.session_state.db, st.session_state.llm)
+
 if "current_session_id" not in st.session_state:
     st.session_state.current_session_id = "main"
 
@@ -76,12 +94,24 @@ with st.sidebar:
     
     if st.session_state.get("current_model") != selected_model:
         st.session_state.current_model = selected_model
-        st.session_state.llm = ChatOllama(
-            model=selected_model,
-            temperature=LLM_TEMPERATURE,
-            top_p=LLM_TOP_P,
-            num_predict=LLM_MAX_TOKENS
-        )
+        st.session_state.llm = CreateLLM(selected_model)
+    # Models no longer selected & the router's large model may be unloaded under memory pressure
+    governor.keep(selected_model, DEFAULT_EMBEDDING_MODEL)
+    
+    # Model cascade, easy questions stay on the selected model & hard ones go to the large one
+    routing = st.checkbox(
+        f"Route hard questions to {ROUTER_LARGE_MODEL}",
+        value=ROUTER_ENABLED and ROUTER_LARGE_MODEL in models,
+        disabled=ROUTER_LARGE_MODEL not in models,
+        help="Applies to both modes, only Enhanced mode re-asks the large model when an answer is poorly grounded"
+    )
+    if routing:
+        router = st.session_state.get("router")
+        if router is None or router.models["small"] is not st.session_state.llm:
+            st.session_state.router = ModelRouter(st.session_state.llm, CreateLLM(ROUTER_LARGE_MODEL))
+        answer_llm = st.session_state.router
+    else:
+        answer_llm = st.session_state.llm
     
     st.divider()
     
@@ -92,7 +122,7 @@ with st.sidebar:
         if os.path.isdir(docs_path):
             with st.spinner("Indexing..."):
                 try:
-                    ClearCudaCache()
+                    governor.request_cleanup()
                     st.session_state.db = InitializeDatabase(
                         DEFAULT_EMBEDDING_MODEL, 
                         docs_path,
@@ -137,8 +167,44 @@ with st.sidebar:
     
     # Manual cache clear button
     if st.button("Clear GPU Cache", use_container_width=True):
-        ClearCudaCache()
-        st.success("Cache cleared")
+        governor.request_cleanup()
+        st.success("Cleanup requested")
+    
+    if governor.history:
+        last = governor.history[-1]
+        st.caption(f"Last memory cleanup: {last['action']} freed {last['rss_freed_mb']:.0f} MB RSS, "
+                   f"{last['device_freed_mb']:.0f} MB GPU")
+    
+    # Opt-in profiling, collapsed stacks go to storage/profiles for flamegraphs
+    if st.toggle("Profile queries", value="profiler" in st.session_state):
+        if "profiler" not in st.session_state:
+            st.session_state.profiler = QueryProfiler()
+        with st.expander("Profile report"):
+            for label, report in st.session_state.profiler.reports():
+                st.text(report)
+    else:
+        st.session_state.pop("profiler", None)
+    
+    coalesced = QUERY_COALESCER.stats()
+    st.caption(f"Duplicate requests coalesced: {coalesced['coalesced']} of {coalesced['calls']}")
+    cached = RETRIEVAL_CACHE.stats()
+    st.caption(f"Retrieval cache hit rate: {cached['hit_rate']:.0%} ({cached['hits']} hits, {cached['size']} cached)")
+    
+    # Search past conversations by keyword, date or cited document
+    with st.expander("Search Sessions"):
+        search_text = st.text_input("Keywords", key="session_search")
+        search_source = st.text_input("Cited document", key="session_search_source")
+        search_since = st.date_input("Since", value=None, key="session_search_since")
+        if search_text or search_source or search_since:
+            if "session_index" not in st.session_state:
+                st.session_state.session_index = SessionIndex()
+            hits = st.session_state.session_index.search(
+                search_text, since=search_since, source=search_source or None, limit=20
+            )
+            st.caption(f"{len(hits)} matching messages")
+            for hit in hits:
+                st.markdown(f"**{hit['session_id']}** ({hit['role']}, {(hit['timestamp'] or '')[:16]})")
+                st.text(hit["snippet"])
     
     # Show load dialog
     if st.session_state.get("show_load_dialog") and saved_sessions:
@@ -166,7 +232,8 @@ with st.sidebar:
                         st.session_state.messages.append({
                             "role": "user" if msg["role"] in ["user", "human"] else "assistant",
                             "content": msg["content"],
-                            "sources": []
+                            "sources": msg.get("sources", []),
+                            "timestamp": msg.get("timestamp")
                         })
                     
                     st.session_state.show_load_dialog = False
@@ -201,71 +268,68 @@ else:
         prompt, session_id, query_mode = process_message(prompt, session_id, query_mode)
         session_id = st.session_state.current_session_id
         
-        # Auto-clear cache every 5 queries
         st.session_state.query_count += 1
-        if st.session_state.query_count % 5 == 0:
-            ClearCudaCache()
         
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        st.session_state.messages.append({"role": "user", "content": prompt, "timestamp": datetime.now().isoformat()})
         
         with st.chat_message("user"):
             st.write(prompt)
         
-        with st.chat_message("assistant"):
+        with profiled(query_mode.lower()), st.chat_message("assistant"):
             try:
                 sources = []
                 
                 if query_mode == "Normal":
                     
-                    retriever = st.session_state.db.as_retriever(
-                        search_kwargs={"k": RETRIEVER_K}
-                    )
-                    
-                    prompt_template = ChatPromptTemplate.from_messages([
-                        ("system", ANSWER_PROMPT),
-                        MessagesPlaceholder(variable_name="history"),
-                        ("human", "{question}")
-                    ])
+                    prompt_template = BuildPrompt()
                     
                     @traceable(name="retrieve_documents")
-                    def get_context(q):
-                        docs = retriever.invoke(q)
-                        return CombineDocuments(docs)
+                    def get_docs(q):
+                        return RetrieveDocuments(st.session_state.db, q, RETRIEVER_K)
                     
                     @traceable(name="rag_chain_run")
-                    def run_rag_chain(chain_with_history, question, session_id):
+                    def run_rag_chain(chain_with_history, question, session_id, retrieved):
                         response_text = ""
                         for chunk in chain_with_history.stream(
                             {"question": question},
                             config={"configurable": {"session_id": session_id}}
                         ):
-                            response_text += chunk if isinstance(chunk, str) else chunk
-                            yield response_text
+                            # The documents the answer is grounded on arrive before the answer
+                            if "docs_with_scores" in chunk:
+                                retrieved[:] = chunk["docs_with_scores"]
+                            if "answer" in chunk:
+                                response_text += chunk["answer"]
+                                yield response_text
 
                     chain = (
                         RunnablePassthrough.assign(
-                            context=lambda x: get_context(x["question"])
+                            docs_with_scores=lambda x: get_docs(x["question"])
+                        )
+                        | RunnablePassthrough.assign(
+                            context=lambda x: CombineDocuments([d for d, _ in x["docs_with_scores"]])
+                        )
+                        | RunnablePassthrough.assign(
+                            answer=RoutedModel(answer_llm, prompt_template) | StrOutputParser()
                         )
-                        | prompt_template
-                        | st.session_state.llm
-                        | StrOutputParser()
                     )
                     
                     chain_with_history = RunnableWithMessageHistory(
-                        chain,
+                        CoalesceChain(chain, name=f"ui:{answer_llm.model}"),
                         GetSession,
                         input_messages_key="question",
-                        history_messages_key="history"
+                        history_messages_key="history",
+                        output_messages_key="answer"
                     )
 
                     placeholder = st.empty()
 
                     response_text = ""
-                    for partial in run_rag_chain(chain_with_history, prompt, session_id):
+                    retrieved = []
+                    for partial in run_rag_chain(chain_with_history, prompt, session_id, retrieved):
                         response_text = partial
                         placeholder.write(response_text)
                     
-                    docs = retriever.invoke(prompt)
+                    docs = [d for d, _ in retrieved]
                     sources = [
                         f"{d.metadata.get('source', 'Unknown')} (Page {d.metadata.get('page', '?')})" 
                         for d in docs[:3]
@@ -281,6 +345,7 @@ else:
                             st.session_state.llm,
                             st.session_state.db
                         )
+                    st.session_state.lightrag.llm = answer_llm
                     
                     @traceable(name="lightrag_generate")
                     def traced_lightrag(prompt):
@@ -290,6 +355,8 @@ else:
                     response_text = result["answer"]
                     
                     st.write(response_text)
+                    if result.get("route"):
+                        st.caption(f"Answered by the {result['route']} model")
                     
                     with st.expander("Evidence"):
                         for ev in result["evidence"][:3]:
@@ -304,7 +371,8 @@ else:
                 st.session_state.messages.append({
                     "role": "assistant",
                     "content": response_text,
-                    "sources": sources
+                    "sources": sources,
+                    "timestamp": datetime.now().isoformat()
                 })
                 
                 # Force save after adding message to state
@@ -316,7 +384,8 @@ else:
                 st.session_state.messages.append({
                     "role": "assistant",
                     "content": response_text,
-                    "sources": []
+                    "sources": [],
+                    "timestamp": datetime.now().isoformat()
                 })
 
 # Auto-save logic runs after rerun, outside the input block
@@ -335,12 +404,15 @@ if st.session_state.get("messages") and len(st.session_state.messages) > 0:
             if msg["role"] in ["user", "assistant"]:
                 session_data["messages"].append({
                     "role": msg["role"],
-                    "content": msg["content"]
+                    "content": msg["content"],
+                    "sources": msg.get("sources", []),
+                    "timestamp": msg.get("timestamp")
                 })
         
         # Only save if we have messages
         if session_data["messages"]:
-            saved_id = SaveSession(session_data, session_id)
+            with profiled("session_save"):
+                saved_id = SaveSession(session_data, session_id)
             # Don't display anything to avoid clutter
             
     except Exception as e:
@@ -0,0 +1,303 @@
+"""
+Vector store building blocks shared by the retrieval layers.
+Anything returned from InitializeDatabase must keep the Chroma interface that
+LightRAG & BuildChain rely on (similarity_search_with_relevance_scores, as_retriever).
+
+Provides:
+- WrappedVectorStore Class
+- MmapVectorStore Class
+- BatchSimilaritySearch(db, vectors, k) -> List[List[Tuple[Document, float]]]
+- StoredVectors(db, docs) -> Optional[List[np.ndarray]]
+"""
+
+import os
+import json
+import math
+import mmap
+import shutil
+import numpy as np
+from typing import List, Tuple, Optional, Any, Iterable
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from config import MMAP_INDEX_DIR, MMAP_INDEX_DTYPE, MMAP_SEARCH_BLOCK
+
+
+class WrappedVectorStore(VectorStore):
+    """
+    Base for stores that sit in front of another vector store.
+    Subclasses override _similarity_search_with_relevance_scores, everything else
+    (as_retriever, score thresholds, similarity_search) is routed through it.
+    """
+
+    def __init__(self, inner: VectorStore):
+        self.inner = inner
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.inner.embeddings
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        return self.inner.add_texts(texts, metadatas=metadatas, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, **kwargs)]
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.inner.similarity_search_with_relevance_scores(query, k=k, **kwargs)
+
+    def batch_similarity_search_with_relevance_scores(self, vectors: List[List[float]], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        return BatchSimilaritySearch(self.inner, vectors, k)
+
+    def stored_vectors(self, docs: List[Document]) -> Optional[List[np.ndarray]]:
+        return StoredVectors(self.inner, docs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any):
+        raise NotImplementedError(f"{cls.__name__} wraps an existing store, build the inner store instead")
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Local vector store for edge devices, no server process & no float32 copy in RAM.
+    Unit-normalized embeddings are quantized (int8 with per-row scales, or float16) into a
+    memory-mapped NumPy file & searched exactly by brute force in blocks, which is plenty
+    for a corpus of a few thousand chunks. Page contents live in a JSONL file & are only
+    read for the rows that are returned.
+
+    Files in persist_directory:
+    - vectors.npy   N x D quantized embeddings
+    - scales.npy    N per-row scales (int8 only)
+    - docs.jsonl    one {"page_content", "metadata"} record per row
+    - offsets.npy   N + 1 byte offsets into docs.jsonl
+    - index.json    dtype, dimension & row count
+    """
+
+    def __init__(self, embedding: Embeddings, persist_directory: str = MMAP_INDEX_DIR):
+        self.embedding = embedding
+        self.persist_directory = persist_directory
+        self.dtype = MMAP_INDEX_DTYPE
+        self.vectors = None
+        self.scales = None
+        self.offsets = None
+        self.docs_map = None
+        self.load()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else self.vectors.shape[0]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    def load(self):
+        """Memory-map the index files if they exist"""
+        if not os.path.exists(self._path("index.json")):
+            return
+        with open(self._path("index.json")) as f:
+            info = json.load(f)
+        if info["count"] == 0:
+            return
+
+        self.dtype = info["dtype"]
+        self.vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+        self.scales = np.load(self._path("scales.npy")) if self.dtype == "int8" else None
+        self.offsets = np.load(self._path("offsets.npy"))
+        with open(self._path("docs.jsonl"), "rb") as f:
+            self.docs_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close(self):
+        if self.docs_map is not None:
+            self.docs_map.close()
+        self.vectors = self.scales = self.offsets = self.docs_map = None
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Normalize rows to unit length & quantize them"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        if dtype == "float16":
+            return vectors.astype(np.float16), None
+        if dtype != "int8":
+            raise ValueError(f"Unsupported index dtype: {dtype}")
+
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales
+
+    def add_embeddings(self, texts: List[str], vectors: List[List[float]], metadatas: Optional[List[dict]] = None) -> List[str]:
+        """Append already embedded texts & rewrite the index files"""
+        metadatas = metadatas or [{} for _ in texts]
+        quantized, scales = self._quantize(np.asarray(vectors), self.dtype)
+
+        old_docs = b""
+        if len(self):
+            quantized = np.concatenate([np.asarray(self.vectors), quantized])
+            if scales is not None:
+                scales = np.concatenate([self.scales, scales])
+            old_docs = self.docs_map[:]
+        first_id = len(self)
+        self._close()
+
+        os.makedirs(self.persist_directory, exist_ok=True)
+        lines = [
+            (json.dumps({"page_content": text or "", "metadata": metadata or {}}) + "\n").encode("utf-8")
+            for text, metadata in zip(texts, metadatas)
+        ]
+        with open(self._path("docs.jsonl"), "wb") as f:
+            f.write(old_docs)
+            f.writelines(lines)
+
+        old_offsets = list(np.load(self._path("offsets.npy"))) if first_id else [0]
+        offsets = np.cumsum([old_offsets[-1]] + [len(line) for line in lines])
+        np.save(self._path("offsets.npy"), np.concatenate([old_offsets[:-1], offsets]).astype(np.int64))
+        np.save(self._path("vectors.npy"), quantized)
+        if scales is not None:
+            np.save(self._path("scales.npy"), scales)
+        with open(self._path("index.json"), "w") as f:
+            json.dump({"dtype": self.dtype, "dimension": int(quantized.shape[1]), "count": int(quantized.shape[0])}, f)
+
+        self.load()
+        return [str(i) for i in range(first_id, len(self))]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas)
+
+    def _document(self, row: int) -> Document:
+        record = json.loads(self.docs_map[self.offsets[row]:self.offsets[row + 1]])
+        return Document(id=str(row), page_content=record["page_content"], metadata=record["metadata"])
+
+    def get_vectors(self, ids: List[str]) -> np.ndarray:
+        """Dequantized unit vectors of the rows with these ids, len(ids) x D"""
+        rows = [int(i) for i in ids]
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def cosine_scores(self, query_vectors: np.ndarray) -> np.ndarray:
+        """Exact cosine similarity of each query against every row, Q x N"""
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        scores = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), MMAP_SEARCH_BLOCK):
+            end = min(start + MMAP_SEARCH_BLOCK, len(self))
+            block = np.asarray(self.vectors[start:end], dtype=np.float32)
+            scores[:, start:end] = queries @ block.T
+            if self.scales is not None:
+                scores[:, start:end] *= self.scales[start:end]
+        return scores
+
+    @staticmethod
+    def _relevance(cosine: float) -> float:
+        #Same scale as Chroma's default (squared L2 on unit vectors), so thresholds carry over
+        return min(1.0, 1.0 - (2.0 - 2.0 * cosine) / math.sqrt(2))
+
+    def _top_k(self, scores: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._document(int(row)), self._relevance(float(scores[row]))) for row in top]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        if kwargs.get("filter"):
+            raise NotImplementedError("MmapVectorStore does not support metadata filters")
+        if not len(self):
+            return []
+        return self._top_k(self.cosine_scores(np.asarray([embedding]))[0], k)
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self.embedding.embed_query(query), k=k, **kwargs)
+
+    def batch_similarity_search_with_relevance_scores(self, vectors: List[List[float]], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Score every query in one pass over the index"""
+        if not len(self):
+            return [[] for _ in vectors]
+        scores = self.cosine_scores(np.asarray(vectors))
+        return [self._top_k(row, k) for row in scores]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, **kwargs)]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   persist_directory: str = MMAP_INDEX_DIR, **kwargs: Any) -> "MmapVectorStore":
+        """Build a fresh index, replacing anything in persist_directory"""
+        if os.path.isdir(persist_directory):
+            shutil.rmtree(persist_directory)
+        store = cls(embedding, persist_directory)
+        store.add_texts(texts, metadatas)
+        return store
+
+    @classmethod
+    def from_chroma(cls, chroma: VectorStore, embedding: Embeddings, persist_directory: str = MMAP_INDEX_DIR) -> "MmapVectorStore":
+        """Convert an existing Chroma database using its stored embeddings, no re-embedding"""
+        data = chroma.get(include=["embeddings", "documents", "metadatas"])
+        if os.path.isdir(persist_directory):
+            shutil.rmtree(persist_directory)
+        store = cls(embedding, persist_directory)
+        if len(data["ids"]):
+            store.add_embeddings(data["documents"], data["embeddings"], data["metadatas"])
+        return store
+
+
+def BatchSimilaritySearch(db: VectorStore, vectors: List[List[float]], k: int = 4) -> List[List[Tuple[Document, float]]]:
+    """Search many pre-embedded queries together, one result list per vector"""
+    if not vectors:
+        return []
+    if hasattr(db, "batch_similarity_search_with_relevance_scores"):
+        return db.batch_similarity_search_with_relevance_scores(vectors, k)
+
+    if hasattr(db, "_collection"):
+        #Chroma answers every query embedding in a single collection query
+        results = db._collection.query(
+            query_embeddings=vectors, n_results=k, include=["documents", "metadatas", "distances"]
+        )
+        relevance = db._select_relevance_score_fn()
+        return [
+            [
+                (Document(page_content=text or "", metadata=metadata or {}), relevance(distance))
+                for text, metadata, distance in zip(results["documents"][i], results["metadatas"][i], results["distances"][i])
+            ]
+            for i in range(len(vectors))
+        ]
+
+    raise TypeError(f"Batched search is not supported for {type(db).__name__}")
+
+
+def StoredVectors(db: VectorStore, docs: List[Document]) -> Optional[List[np.ndarray]]:
+    """
+    Unit vectors the index already holds for search results, so they can be re-scored against
+    another query without embedding them again. One matrix per document (a parent section gets a
+    row per child), None when the store can't provide them.
+    """
+    if hasattr(db, "stored_vectors"):
+        return db.stored_vectors(docs)
+    ids = [doc.id or doc.metadata.get("chunk_id") for doc in docs]
+    if not all(ids):
+        return None
+
+    if hasattr(db, "get_vectors"):
+        vectors = db.get_vectors(ids)
+    elif hasattr(db, "_collection"):
+        data = db._collection.get(ids=ids, include=["embeddings"])
+        by_id = dict(zip(data["ids"], data["embeddings"]))
+        if any(i not in by_id for i in ids):
+            return None
+        vectors = np.asarray([by_id[i] for i in ids], dtype=np.float32)
+    else:
+        return None
+
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return [row[None, :] for row in vectors]
@@ -0,0 +1,198 @@
+"""
+Startup warm-up so the first students of a lab section don't pay for cold caches.
+The most frequent questions from the session archive & the eval CSV are replayed through
+the retrieval path (loading the embedding model, the index pages & any retrieval caches) &
+optionally through generation (loading the chat model & its prompt prefix) before the app
+reports ready. FirstQueryTracker times the first real queries so the benefit can be measured.
+
+Provides:
+- Percentile(values, pct) -> float
+- WarmupQuestions(n, eval_path, index, exclude) -> List[str]
+- WarmUp(db, questions, llm, generate, concurrency) -> dict
+- StartupWarmUp(db, llm) -> dict | None
+- FirstQueryTracker Class
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from coalesce import NormalizeQuery
+from retrieval import RetrieveDocuments
+from config import (RETRIEVER_K, LIGHTRAG_K, EVAL_PATH, WARMUP_QUESTIONS, WARMUP_CONCURRENCY, WARMUP_GENERATE,
+                    WARMUP_TRACK_QUERIES, WARMUP_STATS_PATH)
+
+
+def Percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, 0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def WarmupQuestions(n: int = WARMUP_QUESTIONS, eval_path: str = EVAL_PATH, index=None,
+                    exclude: Optional[List[str]] = None) -> List[str]:
+    """
+    Most frequently asked session questions first, topped up from the eval set, deduplicated.
+    Questions in exclude are left out, e.g. the held-out questions a benchmark times afterwards.
+    """
+    candidates = []
+    try:
+        from session_index import SessionIndex
+        index = index or SessionIndex()
+        candidates += [row["input"] for row in index.top_questions(n)]
+    except Exception as e:
+        print(f"Warm-up: session archive unavailable ({e})")
+
+    if os.path.exists(eval_path):
+        from batch import LoadQuestions
+        candidates += LoadQuestions(eval_path)
+
+    questions, seen = [], {NormalizeQuery(question) for question in exclude or []}
+    for question in candidates:
+        key = NormalizeQuery(question)
+        if key and key not in seen:
+            seen.add(key)
+            questions.append(question)
+    return questions[:n]
+
+
+def WarmUp(db, questions: List[str], llm=None, generate: int = WARMUP_GENERATE,
+           concurrency: int = WARMUP_CONCURRENCY) -> Dict[str, Any]:
+    """
+    Replay questions through retrieval at both modes' k, then answer the first `generate`
+    of them with llm. Returns per-question retrieval latencies, cold first & warm last.
+    """
+    start = time.perf_counter()
+    depths = sorted({RETRIEVER_K, LIGHTRAG_K})
+
+    def retrieve(question: str) -> float:
+        began = time.perf_counter()
+        for k in depths:
+            RetrieveDocuments(db, question, k)
+        return time.perf_counter() - began
+
+    latencies, errors = [], 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="warmup") as pool:
+        for future in [pool.submit(retrieve, q) for q in questions]:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors += 1
+                print(f"Warm-up retrieval failed: {e}")
+    retrieval_s = time.perf_counter() - start
+
+    generated = 0
+    if llm is not None and generate:
+        from llm import BuildPrompt
+        from database_bridge import CombineDocuments
+        from router import SelectModel
+        prompt = BuildPrompt()
+        #Loads the chat model(s) the questions route to & caches the static system prompt prefix in Ollama
+        for question in questions[:generate]:
+            try:
+                docs_with_scores = RetrieveDocuments(db, question, RETRIEVER_K)
+                messages = prompt.format_messages(context=CombineDocuments([d for d, _ in docs_with_scores]),
+                                                  question=question, history=[])
+                SelectModel(llm, question, docs_with_scores).invoke(messages)
+                generated += 1
+            except Exception as e:
+                print(f"Warm-up generation failed: {e}")
+
+    return {
+        "questions": len(questions),
+        "errors": errors,
+        "generated": generated,
+        "retrieval_s": retrieval_s,
+        "total_s": time.perf_counter() - start,
+        "first_ms": latencies[0] * 1000 if latencies else 0.0,
+        "p95_ms": Percentile(latencies, 95) * 1000
+    }
+
+
+_warmed_up: Optional[Dict[str, Any]] = None
+_warmup_lock = threading.Lock()
+
+
+def StartupWarmUp(db, llm=None, n: int = WARMUP_QUESTIONS, generate: int = WARMUP_GENERATE) -> Optional[Dict[str, Any]]:
+    """Warm up once per process (the UI re-runs its script on every interaction)"""
+    global _warmed_up
+    with _warmup_lock:
+        if _warmed_up is None:
+            questions = WarmupQuestions(n)
+            if not questions:
+                return None
+            print(f"Warming up with {len(questions)} questions...")
+            _warmed_up = WarmUp(db, questions, llm, generate)
+            print(f"Warm-up done in {_warmed_up['total_s']:.1f}s "
+                  f"(first retrieval {_warmed_up['first_ms']:.0f} ms, p95 {_warmed_up['p95_ms']:.0f} ms)")
+        return _warmed_up
+
+
+class FirstQueryTracker:
+    """
+    Times the first n real queries after startup. Once n are in, their p95 is appended to
+    WARMUP_STATS_PATH & compared against the latest startup with the opposite warm-up setting.
+    """
+
+    def __init__(self, warmed: bool, n: int = WARMUP_TRACK_QUERIES, path: str = WARMUP_STATS_PATH):
+        self.warmed = warmed
+        self.n = n
+        self.path = path
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.report: Optional[Dict[str, Any]] = None
+
+    @contextmanager
+    def measure(self):
+        """Time the enclosed query if it is one of the first n"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                if len(self.latencies) < self.n:
+                    self.latencies.append(time.perf_counter() - start)
+                    done = len(self.latencies) == self.n
+                else:
+                    done = False
+            if done:
+                self.finish()
+
+    def finish(self) -> Dict[str, Any]:
+        """Record this startup & print the comparison with the other setting"""
+        record = {
+            "time": time.time(),
+            "warmed": self.warmed,
+            "queries": len(self.latencies),
+            "p50_s": Percentile(self.latencies, 50),
+            "p95_s": Percentile(self.latencies, 95)
+        }
+        baseline = None
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        previous = json.loads(line)
+                        if previous.get("warmed") != self.warmed and previous.get("queries") == record["queries"]:
+                            baseline = previous
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+        print(f"\nFirst {record['queries']} queries ({'warm' if self.warmed else 'cold'} start): "
+              f"p50 {record['p50_s']:.2f}s, p95 {record['p95_s']:.2f}s")
+        if baseline is not None:
+            cold, warm = (baseline, record) if self.warmed else (record, baseline)
+            record["p95_improvement_s"] = cold["p95_s"] - warm["p95_s"]
+            print(f"Warm-up p95 improvement vs last {'cold' if self.warmed else 'warm'} start: "
+                  f"{record['p95_improvement_s']:.2f}s ({cold['p95_s']:.2f}s -> {warm['p95_s']:.2f}s)")
+        self.report = record
+        return record